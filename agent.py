@@ -1,10 +1,20 @@
-import ast
+import time
 import numpy as np
+from backup import backup_episodes
+from encoding import convert_string_keys, decode_board, encode_board
+from exploration import EpsilonGreedy
+from metrics import metrics
+from policy import batch_masked_argmax, masked_argmax
+from qtable import make_qtable
+from state_index import state_index_for
+from symmetry import symmetry_for
 from utils import log
 
 
 class Agent(object):
-    def __init__(self, sym, exploration_rate=0.90, decay=0.01, learning_rate=0.5, discount_factor=0.01):
+    def __init__(self, sym, exploration_rate=0.90, decay=0.01, learning_rate=0.5, discount_factor=0.01,
+                 n=3, states=None, symmetry=True, strategy=None, cache=None,
+                 index=True):
         """
         An agent is a problem solver.
         It should perform actions like:
@@ -20,17 +30,37 @@ class Agent(object):
                 states during temporal difference learning.
         - discount_factor: The factor by which a reward must be reduced
                 to be passed on for intermediate states
+        - n: The number of rows and columns in the tic-tac-toe board.
+        - states: The table of states to learn into, a `qtable.QTable` sized for the board by default.
+        - symmetry: If True, rotations and reflections of a board share one entry in the table.
+        - strategy: How to choose between exploring and exploiting, one of the classes
+                in `exploration`, epsilon greedy by default.
+        - cache: A `policy_cache.PolicyCache` of the best move per state, for agents with large tables.
+                Not for a table shared with other processes, which change it without invalidating the cache.
+        - index: If True, look the moves and the states they lead to up in the
+                `state_index.StateIndex` of the board, when the board is small enough to have one.
         """
         self.sym = sym
-        self.states = {}
-        # The list of states, a linear representation of the 3x3 tic tac toe board
+        self.n = n
+        self.states = make_qtable(n) if states is None else states
+        # The table of states, keyed by the base-3 integer code of the tic tac toe board
+        self.symmetry = symmetry_for(n) if symmetry else None
+        # With symmetry, the keys and actions in the table are those of the canonical board.
         self.state_order = []
         # The order in which the agent progressed through states to be able to
         # assign discounted rewards to older states.
+        self.tried = {}
+        # state key -> bitmask of the cells (of the canonical board) the agent has learned a value for.
         self.learning_rate = learning_rate
         self.decay = decay
         self.discount_factor = discount_factor
         self.exploration_rate = exploration_rate
+        self.min_exploration_rate = 0.3
+        self.strategy = EpsilonGreedy() if strategy is None else strategy
+        if cache is not None and self.states.shared:
+            raise ValueError('A policy cache can not be used with a shared table, other processes update it')
+        self.cache = cache
+        self.index = state_index_for(n) if index else None
 
     @staticmethod
     def serialize_board(board):
@@ -38,15 +68,45 @@ class Agent(object):
         convert the matrix
 
             [
-                [1, 2, 3],
-                [4, 5, 6],
-                [7, 8, 9],
+                [0, 1, 2],
+                [0, 0, 1],
+                [2, 0, 0],
             ]
 
-            to the form: "123456789" i.e. flatten and stringify
+            to the form: 012001200 read as a base-3 integer.
+            i.e. the integer value of the old "012001200" string keys.
         """
-        serialized_board = board.flatten()
-        return ''.join([str(i) for i in serialized_board.flatten().tolist()])
+        return encode_board(board)
+
+    def load_string_states(self, states):
+        """
+        Use a table of states keyed by the old string format ("012001200").
+
+        With symmetry, the boards which are rotations or reflections of one another
+        share a row, which gets the mean of their values.
+        """
+        self.states = make_qtable(self.n)
+        merged = {}
+        # state key -> (sum of the values, number of boards)
+        for state_key, values in convert_string_keys(states).items():
+            values = np.asarray(values, dtype=np.float64).reshape(self.n, self.n)
+            if self.symmetry is not None:
+                state_key, transform = self.symmetry.canonicalize(decode_board(state_key, self.n))
+                values = self.symmetry.canonical_values(transform, values)
+            total, count = merged.get(state_key, (0, 0))
+            merged[state_key] = (total + values, count + 1)
+        for state_key, (total, count) in merged.items():
+            self.states[state_key] = total / count
+        self.tried = {}
+        if self.cache is not None:
+            self.cache.clear()
+
+    @property
+    def value(self):
+        """
+        The integer plotted on the board for the agent's symbol.
+        """
+        return 1 if self.sym == 'O' else 2
 
     def get_serious(self):
         """
@@ -55,128 +115,260 @@ class Agent(object):
         """
         self.exploration_rate = 0
 
-    def learn_by_temporal_difference(self, reward, new_state_key, state_key):
+    def decay_exploration(self, episodes=1):
         """
-        Implementation of the temporal difference formula.
-        https://en.wikipedia.org/wiki/Temporal_difference_learning
-        https://detailed.af/reinforcement/
+        The exploration schedule: explore a little less after every game,
+        down to `min_exploration_rate`. An agent that has been made serious stays serious.
+
+        params:
+        - episodes(default=1): The number of games played since the last call.
+        """
+        if self.exploration_rate > self.min_exploration_rate:
+            self.exploration_rate = max(
+                self.exploration_rate - self.decay * episodes,
+                self.min_exploration_rate
+            )
+
+    def position_of(self, board, state_key=None):
+        """
+        Returns the position of the board in `self.index`, -1 without an index
+        or if the board isn't one where the agent is to move.
+
+        params:
+        - board: The matrix of the tic-tac-toe board.
+        - state_key(default=None): The code of the board (not canonical), if already known.
         """
-        old_state = self.states.get(state_key, np.zeros((3,3)))
-        self.exploration_rate = max(self.exploration_rate - self.decay, 0.3)
-        return self.learning_rate * ((reward * self.states[new_state_key]) - old_state)
+        if self.index is None:
+            return -1
+        if state_key is None:
+            state_key = Agent.serialize_board(board)
+        position = self.index.position(state_key)
+        if position >= 0 and self.index.to_move[position] != self.value:
+            return -1
+        return position
 
-    def set_state(self, old_board, action):
+    def set_state(self, old_board, action, state_key=None, transform=None):
         """
         Store the action performed for a given state
         """
-        state_key = Agent.serialize_board(old_board)
+        if self.symmetry is not None:
+            if transform is None:
+                state_key, transform = self.symmetry.canonicalize(old_board)
+            action = self.symmetry.canonical_action(transform, action)
+            # Learn the action as it is on the canonical board.
+        elif state_key is None:
+            state_key = Agent.serialize_board(old_board)
         self.state_order.append((state_key, action))
 
     def on_reward(self, reward):
         """
         Assign rewards to actions performed on intermediate states.
+
+        The last action gets the reward, each action before it gets the reward reduced by
+        `discount_factor` once more, and every value moves towards its reward by `learning_rate`
+        (temporal difference learning https://en.wikipedia.org/wiki/Temporal_difference_learning),
+        all in one vectorized update of the table.
         """
         if len(self.state_order) == 0:
             return None
-        new_state_key, new_action = self.state_order.pop()
-        # get the latest state and the action performed that led to the reward
-
-        self.states[new_state_key] = np.zeros((3,3))
-        # initialize the value with a zero matrix
-
-        self.states[new_state_key].itemset(new_action, reward)
-        # Assign the reward to this state
-
-        while self.state_order:
-            # while there is a stack of states (that were caused by actions performed)
-
-            state_key, action = self.state_order.pop()
-            # get the state and action performed on it
+        keys = [state_key for state_key, _ in self.state_order]
+        cells = [item_x * self.n + item_y for _, (item_x, item_y) in self.state_order]
+        self.state_order = []
+        for state_key, cell in zip(keys, cells):
+            self.tried[state_key] = self.tried.get(state_key, 0) | 1 << cell
+        log('update learning', keys, cells, reward)
+        if metrics.enabled:
+            states = len(self.states)
+            start = time.perf_counter()
+        backup_episodes(self.states, [(keys, cells, reward)], self.learning_rate, self.discount_factor)
+        if self.cache is not None:
+            self.cache.invalidate(keys)
+        self.decay_exploration()
+        if metrics.enabled:
+            metrics.add_time('on_reward', time.perf_counter() - start)
+            metrics.count('states_added', len(self.states) - states)
+            metrics.count('updates', len(keys))
 
-            reward *= self.discount_factor
-            # Reduce the original reward (self.discount_factor is a number < 1)
+    def select_move(self, board, state_key=None):
+        """
+        Choose from exploration and exploitation, as decided by `self.strategy`.
 
-            # Implementation of the value function
-            if state_key in self.states:
-                reward += self.learn_by_temporal_difference(reward, new_state_key, state_key).item(new_action)
-                # If this state was encountered due to a different experiment, increase its previous value
-                log('update learning', state_key, action, reward)
-                log(self.states[state_key])
-                self.states[state_key].itemset(action, reward)
-            else:
-                self.states[state_key] = np.zeros((3,3))
-                reward = self.learn_by_temporal_difference(reward, new_state_key, state_key).item(new_action)
-                self.states[state_key].itemset(action, reward)
-                # If this state was not encountered before, assign it the discounted reward as its value
-            new_state_key = state_key
-            new_action = action
-
-    def select_move(self, board):
-        """
-        Choose from exploration and exploitation.
-        Epsilon greedy implementation for policy.
-        http://home.deib.polimi.it/restelli/MyWebSite/pdf/rl5.pdf
-        http://tokic.com/www/tokicm/publikationen/papers/AdaptiveEpsilonGreedyExploration.pdf
-        """
-        explore_message = 'Exploration turn'
-        missing_experience_message = 'No experience for this state: explore'
-        experience_present_message = 'Using previous experience'
-        state_key = Agent.serialize_board(board)
+        params:
+        - board: The matrix of the tic-tac-toe board.
+        - state_key(default=None): The code of the board if it is already known (`Board.state_code`),
+                saves serializing the board again.
+        """
+        transform = None
+        position = self.position_of(board, state_key)
+        if position >= 0:
+            state_key, transform = self.index_key(position)
+        elif self.symmetry is not None:
+            state_key, transform = self.symmetry.canonicalize(board)
+        elif state_key is None:
+            state_key = Agent.serialize_board(board)
         log('-' * 100)
         log('state key', state_key)
-        p =  np.random.random()
-        exploration = p < self.exploration_rate
-        log(p, '<', self.exploration_rate)
-        message = explore_message \
-            if exploration \
-            else missing_experience_message \
-                if state_key not in self.states \
-                else experience_present_message
-
-        log(message)
-        action = self.explore_board(board) \
-                    if exploration or state_key not in self.states \
-                    else self.exploit_board(state_key, board)
+        if metrics.enabled:
+            metrics.count('moves')
+            metrics.count('table_hits' if state_key in self.states else 'table_misses')
+        action = self.strategy.choose(self, board, state_key, transform=transform, position=position)
         log('Choose cell', action)
-        self.set_state(board, action)
+        self.set_state(board, action, state_key=state_key, transform=transform)
         return action
 
-    def explore_board(self, board, depth=0):
+    def index_key(self, position):
+        """
+        Returns the key of a position of `self.index` in the table and the transform to it.
+        """
+        if self.symmetry is not None:
+            return int(self.index.canonical[position]), int(self.index.transforms[position])
+        return int(self.index.codes[position]), None
+
+    def vacant_cells(self, board, position=-1):
         """
-        Find an empty cell from the board
+        Returns the indices (row * N + column) of the vacant cells of the board.
+
+        params:
+        - board: The matrix of the tic-tac-toe board.
+        - position(default=-1): The position of the board in `self.index`, see `position_of`.
         """
-        zero_x, zero_y = np.where(board == 0)
-        vacant_cells = [(x, y) for x, y in zip(zero_x, zero_y)]
-        pseudo_board = np.array(board, copy=True)
-        randomly_selected_vacant_cell = np.random.choice(len(vacant_cells))
-        selected_cell = vacant_cells[randomly_selected_vacant_cell]
-        pseudo_board[selected_cell[0]][selected_cell[1]] = 1 if self.sym == 'O' else 2
-        state_key = Agent.serialize_board(pseudo_board)
-        log(state_key)
-        if state_key not in self.states or depth == 9:
-            return selected_cell
-        depth += 1
-        return self.explore_board(board, depth=depth)
+        if position >= 0:
+            return np.flatnonzero(self.index.free[position])
+        return np.flatnonzero(np.ravel(board) == 0)
 
-    def exploit_board(self, state_key, board):
+    def explore_board(self, board, state_key=None, transform=None, position=-1):
+        """
+        Find an empty cell from the board, preferring the ones the agent has never played on it.
+
+        params:
+        - board: The matrix of the tic-tac-toe board.
+        - state_key(default=None): The code of the board (canonical with symmetry), if already known.
+        - transform(default=None): The symmetry which turns the board into the canonical board of `state_key`.
+        - position(default=-1): The position of the board in `self.index`, see `position_of`.
+        """
+        if state_key is None:
+            if self.symmetry is not None:
+                state_key, transform = self.symmetry.canonicalize(board)
+            else:
+                state_key = Agent.serialize_board(board)
+        cells = self.vacant_cells(board, position)
+        canonical = cells if transform is None else self.symmetry.inverse[transform][cells]
+        # The marks and the table are in the orientation of the canonical board.
+        mask = self.tried.get(state_key, 0)
+        tried = np.array([mask >> cell & 1 for cell in canonical.tolist()], dtype=bool)
+        values = self.states.get(state_key)
+        if values is not None:
+            tried |= np.ravel(values)[canonical] != 0
+            # A table loaded from a file comes without the marks, the values it learned tell the same.
+        untried = cells[~tried]
+        log('untried cells', len(untried), 'of', len(cells))
+        if metrics.enabled:
+            metrics.count('explorations')
+        candidates = untried if len(untried) else cells
+        cell = candidates[np.random.randint(len(candidates))]
+        return divmod(int(cell), self.n)
+
+    def exploit_board(self, state_key, board, transform=None, position=-1):
         """
         Find the best action for the given state
+
+        params:
+        - transform(default=None): The symmetry which turns the board into the canonical board of `state_key`.
+        - position(default=-1): The position of the board in `self.index`, see `position_of`.
         """
+        if metrics.enabled:
+            metrics.count('exploitations')
+        if self.cache is not None:
+            cell = self.cache.get(state_key)
+            if cell is not None:
+                action = divmod(cell, self.n)
+                return action if transform is None else self.symmetry.original_action(transform, action)
         state_values = self.states[state_key]
         # For the current state get the matrix of accumulated rewards
+        if transform is not None:
+            state_values = self.symmetry.original_values(transform, state_values)
+            # Turn the values back to the orientation of the board being played.
         log('State rewards', state_values)
-        free_cells = np.argwhere(board == 0)
-        best_values = {}
-        for idx, value in np.ndenumerate(state_values):
-            if idx in free_cells:
-                best_values[str(idx)] = value
-
-        best_value_indices = [key
-            for m in [max(best_values.values())]
-                for key, val in best_values.items()
-                    if val == m
-        ]
-
-        log('best_value_indices', best_value_indices)
-        select_index = np.random.choice(len(best_value_indices))
-        return ast.literal_eval(best_value_indices[select_index])
+        free = self.index.free[position] if position >= 0 else board == 0
+        action = masked_argmax(state_values, free)
+        # The best of the vacant cells, picked at random among equals.
+        if self.cache is not None:
+            cached = action if transform is None else self.symmetry.canonical_action(transform, action)
+            self.cache.put(state_key, cached[0] * self.n + cached[1])
+            # Cached in the orientation of the canonical board, it serves every symmetric board.
+        return action
+
+    def policy(self, board):
+        """
+        The best known move for the board, or a random vacant cell for a board never seen.
+        Unlike `select_move` it never explores and doesn't record the move for learning,
+        so one agent can serve any number of games at once.
+
+        params:
+        - board: The matrix of the tic-tac-toe board.
+        return: tuple(int, int), the row and column to play.
+        """
+        transform = None
+        position = self.position_of(board)
+        if position >= 0:
+            state_key, transform = self.index_key(position)
+        elif self.symmetry is not None:
+            state_key, transform = self.symmetry.canonicalize(board)
+        else:
+            state_key = Agent.serialize_board(board)
+        if state_key in self.states:
+            return self.exploit_board(state_key, board, transform=transform, position=position)
+        return self.explore_board(board, state_key=state_key, transform=transform, position=position)
+
+    def exploit_boards(self, boards):
+        """
+        Find the best action for many boards at once, without recording them with `set_state`.
+        Boards which are not in the table get a random vacant cell.
+
+        params:
+        - boards: An array of shape (boards, N, N).
+        return: list of (row, column), one per board.
+        """
+        boards = np.asarray(boards)
+        count = len(boards)
+        if self.symmetry is not None:
+            keys, transforms = self.symmetry.canonicalize_boards(boards)
+        else:
+            keys = np.array(
+                [Agent.serialize_board(board) for board in boards],
+                dtype=np.int64 if 3 ** (self.n * self.n) < 2 ** 63 else object
+            )
+            # Like `Symmetry.weights`, python ints for the codes of boards larger than 6x6.
+
+        cells = np.full(count, -1, dtype=np.int64)
+        if self.cache is not None:
+            for idx, key in enumerate(keys.tolist()):
+                cell = self.cache.get(key)
+                if cell is not None:
+                    cells[idx] = cell
+            if self.symmetry is not None:
+                hits = cells >= 0
+                cells[hits] = self.symmetry.permutations[transforms[hits], cells[hits]]
+                # The cache holds the cells of the canonical boards, see `exploit_board`.
+        missing = np.flatnonzero(cells < 0)
+        if not len(missing):
+            return [divmod(int(cell), self.n) for cell in cells]
+
+        rows = self.states.rows(keys[missing])
+        values = np.where((rows >= 0)[:, None], self.states.values[np.maximum(rows, 0)], 0)
+        # Gather the values of every board with one lookup, unknown states count as all zeroes.
+
+        if self.symmetry is not None:
+            values = values[np.arange(len(missing))[:, None], self.symmetry.inverse[transforms[missing]]]
+            # Turn the values back to the orientation of each board.
+
+        cells[missing] = batch_masked_argmax(values, boards[missing].reshape(len(missing), -1) == 0)
+        if self.cache is not None:
+            known = missing[rows >= 0]
+            canonical = cells[known]
+            if self.symmetry is not None:
+                canonical = self.symmetry.inverse[transforms[known], canonical]
+            for key, cell in zip(keys[known].tolist(), canonical.tolist()):
+                self.cache.put(key, cell)
+            # Only the moves of states in the table, the random ones for unknown states aren't worth keeping.
+        return [divmod(int(cell), self.n) for cell in cells]
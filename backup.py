@@ -0,0 +1,66 @@
+import numpy as np
+
+
+def discounted_returns(length, reward, discount_factor):
+    """
+    Returns the reward passed back to each move of a game of `length` moves,
+    the last move gets the whole reward and every move before it gets
+    `discount_factor` times what the move after it got.
+
+    params:
+
+    - length int: The number of moves the agent made.
+    - reward float: The reward at the end of the game.
+    - discount_factor float: The factor by which a reward is reduced for each step back.
+    return: array of `length` returns, in the order of the moves.
+    """
+    return reward * np.power(discount_factor, np.arange(length - 1, -1, -1, dtype=np.float64))
+
+
+def td_backup(values, rows, cells, returns, learning_rate):
+    """
+    Move the value of each (state, action) towards its return, all at once:
+
+        Q(s, a) <- Q(s, a) + learning_rate * (mean return - Q(s, a))
+
+    A (state, action) which appears more than once in the batch, like the openings of
+    most games, moves once towards the mean of its returns. Summing one update per
+    appearance would overshoot as soon as `learning_rate` times the appearances passes 1.
+
+    params:
+
+    - values: The (states, N*N) array of a `qtable.QTable`, updated in place.
+    - rows: The row of `values` for each move.
+    - cells: The cell (row * N + column) played in each move.
+    - returns: The return of each move, see `discounted_returns`.
+    - learning_rate float: How far to move towards the returns.
+    """
+    width = values.shape[1]
+    flat = np.asarray(rows, dtype=np.int64) * width + np.asarray(cells, dtype=np.int64)
+    pairs, inverse = np.unique(flat, return_inverse=True)
+    mean_returns = np.bincount(inverse, weights=np.asarray(returns, dtype=np.float64)) / np.bincount(inverse)
+    rows, cells = pairs // width, pairs % width
+    values[rows, cells] += (learning_rate * (mean_returns - values[rows, cells])).astype(values.dtype)
+
+
+def backup_episodes(table, episodes, learning_rate, discount_factor):
+    """
+    Apply the rewards of a batch of games to a table in one vectorized pass.
+
+    params:
+
+    - table: The `qtable.QTable` to update.
+    - episodes: A list of (state keys, cells, reward), the moves an agent made in a game
+            in the order they were made and the reward it got at the end.
+    - learning_rate float: See `td_backup`.
+    - discount_factor float: See `discounted_returns`.
+    """
+    keys, cells, returns = [], [], []
+    for episode_keys, episode_cells, reward in episodes:
+        keys.extend(episode_keys)
+        cells.extend(episode_cells)
+        returns.append(discounted_returns(len(episode_keys), reward, discount_factor))
+    if not keys:
+        return
+    rows = table.add_rows(keys)
+    td_backup(table.values, rows, cells, np.concatenate(returns), learning_rate)
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class BatchBoard(object):
+    """
+    K games of tic-tac-toe played in lockstep.
+
+    All the boards are held in a single (K, N, N) matrix using the same values as `Board`:
+        - 0: empty cell.
+        - 1: cell occupied by symbol 'O'.
+        - 2: cell occupied by symbol 'X'.
+
+    Each step plots one symbol on every board, the winners and draws of all K
+    games are found with reductions over the whole matrix, and the boards
+    of finished games are cleared so that the next step starts a new game in that slot.
+    """
+    def __init__(self, k, n=3, first_value=2):
+        """
+        Constructor of the BatchBoard class.
+
+        params:
+
+        - k int: The number of games to be played together.
+        - n(default=3) int: The number of rows and columns in each tic-tac-toe board.
+        - first_value(default=2) int: The value of the symbol which moves first in every game, 'X' by default.
+        """
+        self.k = k
+        self.n = n
+        self.first_value = first_value
+        self.boards = np.zeros((k, n, n), dtype=np.int8)
+        self.turn = np.full(k, first_value, dtype=np.int8)
+        # The value of the symbol to be plotted next on each board.
+
+        self.games_played = 0
+        self._slots = np.arange(k)
+        self._diagonal = np.arange(n)
+        self._anti_diagonal = n - 1 - self._diagonal
+
+    def reset(self, slots=None):
+        """
+        Clear the boards in `slots`, or all of them if no slots are given.
+
+        params:
+
+        - slots(default=None): A boolean mask or an array of indices of the boards to clear.
+        """
+        if slots is None:
+            slots = self._slots
+        self.boards[slots] = 0
+        self.turn[slots] = self.first_value
+
+    def free_cells(self):
+        """
+        Returns a (K, N, N) boolean matrix, True where a cell is vacant.
+        """
+        return self.boards == 0
+
+    def random_moves(self, rng=np.random):
+        """
+        Pick a vacant cell uniformly at random on every board.
+
+        params:
+
+        - rng(default=np.random): A numpy random generator or the np.random module.
+        return: tuple(array, array), the rows and columns of the picked cells.
+        """
+        scores = rng.random(self.boards.shape)
+        scores[~self.free_cells()] = -1
+        cells = scores.reshape(self.k, -1).argmax(axis=1)
+        return np.divmod(cells, self.n)
+
+    def winners(self, values):
+        """
+        Check which boards have a row, column or diagonal filled with the given values.
+
+        params:
+
+        - values: An array of K symbol values, one to be checked per board.
+        return: A boolean array of length K.
+        """
+        same = self.boards == np.asarray(values, dtype=np.int8)[:, None, None]
+        return same.all(axis=2).any(axis=1) | \
+            same.all(axis=1).any(axis=1) | \
+            same[:, self._diagonal, self._diagonal].all(axis=1) | \
+            same[:, self._diagonal, self._anti_diagonal].all(axis=1)
+
+    def step(self, item_x, item_y):
+        """
+        Plot the symbol whose turn it is on every board.
+
+        Moves on occupied cells are ignored, the symbol to move on such boards doesn't change.
+        Boards on which the game ended are reset before returning.
+
+        params:
+
+        - item_x: An array of K rows, one per board.
+        - item_y: An array of K columns, one per board.
+        return: tuple(array, array, array)
+            - winners: The value of the winning symbol per board, 0 if the game didn't end in a win.
+            - draws: A boolean array, True where the game ended in a draw.
+            - illegal: A boolean array, True where the move was on an occupied cell.
+        """
+        item_x = np.asarray(item_x)
+        item_y = np.asarray(item_y)
+        legal = self.boards[self._slots, item_x, item_y] == 0
+        values = self.turn.copy()
+        self.boards[self._slots[legal], item_x[legal], item_y[legal]] = values[legal]
+        # Plot the symbols only on the boards where the cell was vacant.
+
+        won = legal & self.winners(values)
+        draws = legal & ~won & ~self.free_cells().any(axis=(1, 2))
+        winners = np.where(won, values, 0).astype(np.int8)
+
+        self.turn[legal] = 3 - values[legal]
+        # 1 <-> 2, swap turns between 'O' and 'X'.
+
+        finished = won | draws
+        if finished.any():
+            self.games_played += int(finished.sum())
+            self.reset(finished)
+        return winners, draws, ~legal
@@ -0,0 +1,217 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import numpy as np
+from agent import Agent
+from board import Board
+from train import train
+
+
+def percentiles(samples_ns):
+    """
+    Summarize a list of latencies in nanoseconds.
+    """
+    samples = np.array(samples_ns, dtype=np.float64)
+    return {
+        'p50_ns': float(np.percentile(samples, 50)),
+        'p90_ns': float(np.percentile(samples, 90)),
+        'p99_ns': float(np.percentile(samples, 99)),
+        'mean_ns': float(samples.mean()),
+        'samples': len(samples),
+    }
+
+
+def random_games(n, games, k=None):
+    """
+    Play random games on headless boards.
+
+    return: list of games, each a list of (mark, row, column) moves.
+    """
+    played = []
+    for _ in range(games):
+        cells = [(item_x, item_y) for item_x in range(n) for item_y in range(n)]
+        random.shuffle(cells)
+        game = Board(n=n, k=k, headless=True)
+        moves = []
+        for idx, (item_x, item_y) in enumerate(cells):
+            mark = 'XO'[idx % 2]
+            moves.append((mark, item_x, item_y))
+            result = game.step(mark, item_x, item_y)
+            if result.winner or result.draw:
+                break
+        played.append(moves)
+    return played
+
+
+def bench_board(sizes, games):
+    """
+    Moves per second of `Board.step`, and the cost of a win check, for each board size.
+    """
+    results = {}
+    for n in sizes:
+        played = random_games(n, games)
+        total_moves = sum(len(moves) for moves in played)
+
+        start = time.perf_counter()
+        for moves in played:
+            game = Board(n=n, headless=True)
+            for move in moves:
+                game.step(*move)
+        elapsed = time.perf_counter() - start
+
+        counters = [Board(n=n, headless=True).lines for _ in played]
+        values = [[(2 if mark == 'X' else 1, item_x, item_y) for mark, item_x, item_y in moves] for moves in played]
+        start = time.perf_counter()
+        for lines, moves in zip(counters, values):
+            for move in moves:
+                lines.move(*move)
+        win_checks = time.perf_counter() - start
+
+        results[str(n)] = {
+            'moves': total_moves,
+            'moves_per_sec': total_moves / elapsed,
+            'win_check_ns_per_op': win_checks * 1e9 / total_moves,
+        }
+    return results
+
+
+def trained_agents(epochs):
+    """
+    Two agents after `epochs` games of self-play, and the time it took.
+    """
+    bot1, bot2 = Agent(sym='X'), Agent(sym='O')
+    start = time.perf_counter()
+    train(epochs, bot1, bot2)
+    return bot1, bot2, time.perf_counter() - start
+
+
+def bench_agent(agent, samples):
+    """
+    Latency percentiles of the agent's methods on boards from random games.
+    """
+    boards = []
+    for moves in random_games(agent.n, samples):
+        game = Board(n=agent.n, headless=True)
+        for move in moves[:random.randrange(len(moves))]:
+            game.step(*move)
+        boards.append(game.board)
+
+    timings = {'serialize_board': [], 'select_move': [], 'explore_board': [], 'exploit_board': []}
+    clock = time.perf_counter_ns
+    for board in boards:
+        start = clock()
+        Agent.serialize_board(board)
+        timings['serialize_board'].append(clock() - start)
+
+        start = clock()
+        agent.select_move(board)
+        timings['select_move'].append(clock() - start)
+        agent.state_order = []
+
+        start = clock()
+        agent.explore_board(board)
+        timings['explore_board'].append(clock() - start)
+
+        if agent.symmetry is not None:
+            state_key, transform = agent.symmetry.canonicalize(board)
+        else:
+            state_key, transform = Agent.serialize_board(board), None
+        if state_key in agent.states:
+            start = clock()
+            agent.exploit_board(state_key, board, transform=transform)
+            timings['exploit_board'].append(clock() - start)
+
+    return {name: percentiles(samples) for name, samples in timings.items() if samples}
+
+
+def bench_training(epochs):
+    """
+    Games per second of `train.train` and updates per second of `Agent.on_reward`.
+    """
+    bot1, bot2, elapsed = trained_agents(epochs)
+
+    episodes = []
+    for moves in random_games(bot1.n, 1000):
+        game = Board(n=bot1.n, headless=True)
+        order = []
+        for mark, item_x, item_y in moves:
+            if mark == bot1.sym:
+                bot1.set_state(game.board, (item_x, item_y))
+                order.extend(bot1.state_order)
+                bot1.state_order = []
+            game.step(mark, item_x, item_y)
+        episodes.append(order)
+
+    updates = sum(len(order) for order in episodes)
+    start = time.perf_counter()
+    for order in episodes:
+        bot1.state_order = list(order)
+        bot1.on_reward(1)
+    reward_time = time.perf_counter() - start
+
+    return {
+        'epochs': epochs,
+        'games_per_sec': epochs / elapsed,
+        'on_reward_calls_per_sec': len(episodes) / reward_time,
+        'on_reward_updates_per_sec': updates / reward_time,
+    }, bot1
+
+
+def bench_memory(agent):
+    """
+    Bytes per state stored in the agent's table.
+    """
+    states = len(agent.states)
+    return {
+        'table': type(agent.states).__name__,
+        'states': states,
+        'table_bytes': agent.states.nbytes,
+        'bytes_per_state': agent.states.nbytes / states if states else None,
+        # A dense table is preallocated, so this shrinks as it fills up.
+        'value_bytes_per_state': agent.states.cells * agent.states.values.itemsize,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the board, the agent and training.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[3, 5, 9, 15],
+                        help='board sizes for the board benchmark')
+    parser.add_argument('--games', type=int, default=2000,
+                        help='random games per board size')
+    parser.add_argument('--epochs', type=int, default=5000,
+                        help='self-play games for the training benchmark')
+    parser.add_argument('--samples', type=int, default=2000,
+                        help='boards per agent latency measurement')
+    parser.add_argument('--output', default=None,
+                        help='file to write the JSON report to, stdout by default')
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    training, agent = bench_training(args.epochs)
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'seed': args.seed,
+        'board': bench_board(args.sizes, args.games),
+        'training': training,
+        'agent': bench_agent(agent, args.samples),
+        'memory': bench_memory(agent),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return report
+
+
+if __name__ == '__main__':
+    main()
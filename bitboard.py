@@ -0,0 +1,221 @@
+from lines import segments
+
+
+_LINE_MASKS = {}
+# Cache of the winning line masks per board size and length to win, these never change
+# so there is no point computing them for every new game.
+
+
+def cell_bit(n, item_x, item_y):
+    """
+    Returns the bit which represents the cell at row `item_x` and column `item_y`
+    on a board with `n` rows and columns.
+
+    The cells are numbered row by row, so on a 3x3 board:
+
+        0 | 1 | 2
+        ---------
+        3 | 4 | 5
+        ---------
+        6 | 7 | 8
+
+    params:
+
+    - n int: The number of rows and columns in the tic-tac-toe board.
+    - item_x int: The row of the cell.
+    - item_y int: The column of the cell.
+    return: int
+    """
+    return 1 << (item_x * n + item_y)
+
+
+def line_masks(n, k=None):
+    """
+    Returns the winning lines of an NxN board as bitmasks along with
+    the lines that pass through each of the cells.
+
+    A line is any row, column or diagonal (or any k cells in a row of them, see `lines.segments`),
+    if all the bits of a line are set in the mask of a symbol, that symbol has won.
+
+    params:
+
+    - n int: The number of rows and columns in the tic-tac-toe board.
+    - k(default=None) int: The number of marks in a row needed to win, defaults to n.
+    return: tuple(list(int), list(list(int)))
+        - All the winning lines.
+        - For each cell index, the winning lines which contain that cell.
+    """
+    k = n if k is None else k
+    if (n, k) in _LINE_MASKS:
+        return _LINE_MASKS[(n, k)]
+
+    found, segments_by_cell = segments(n, k)
+    lines = [sum(1 << cell for cell in segment) for segment in found]
+    lines_by_cell = [
+        [lines[segment] for segment in cell_segments]
+        for cell_segments in segments_by_cell
+    ]
+    # Only the lines through the latest move can be completed by it,
+    # so the win check needs to look at those instead of all of them.
+
+    _LINE_MASKS[(n, k)] = (lines, lines_by_cell)
+    return _LINE_MASKS[(n, k)]
+
+
+class BitBoard(object):
+    """
+    A bitwise game engine for tic-tac-toe.
+
+    Instead of a matrix, the board is kept as one integer mask per symbol,
+    the bit `x * n + y` of a mask is set if the symbol occupies the cell at (x, y).
+    The values of the symbols are the same as the ones used by `Board`:
+        - 1: cell occupied by symbol 'O'.
+        - 2: cell occupied by symbol 'X'.
+
+    Checking for a win is a bitwise AND against the precomputed lines through
+    the latest move, checking for a draw is a comparison with the full board mask.
+    """
+    def __init__(self, n=3, k=None):
+        """
+        Constructor of the BitBoard class.
+
+        params:
+
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        - k(default=None) int: The number of marks in a row needed to win, defaults to n.
+        """
+        self.n = n
+        self.full_mask = (1 << (n * n)) - 1
+        # A mask with every cell of the board set.
+
+        self.lines, self.lines_by_cell = line_masks(n, k)
+        self.masks = None
+        self.reset()
+
+    def reset(self):
+        """
+        Clear both the masks when a new game has to be started.
+        """
+        self.masks = {1: 0, 2: 0}
+
+    @property
+    def occupied(self):
+        """
+        The mask of all the cells which have a symbol in them.
+        """
+        return self.masks[1] | self.masks[2]
+
+    def is_free(self, item_x, item_y):
+        """
+        Check if the cell at (item_x, item_y) is vacant.
+
+        params:
+
+        - item_x int: The row of the cell.
+        - item_y int: The column of the cell.
+        """
+        return not self.occupied & cell_bit(self.n, item_x, item_y)
+
+    def free_cells(self):
+        """
+        Returns the list of (row, column) of all the vacant cells.
+        """
+        occupied = self.occupied
+        return [
+            divmod(cell, self.n)
+            for cell in range(self.n * self.n)
+            if not occupied & (1 << cell)
+        ]
+
+    def move(self, item, item_x, item_y):
+        """
+        Plot the symbol with value `item` at (item_x, item_y)
+        and check if it completed a line.
+
+        The cell is expected to be vacant, use `is_free` to check that first.
+
+        params:
+
+        - item int: The value of the symbol, 1 for 'O' and 2 for 'X'.
+        - item_x int: The row of the cell.
+        - item_y int: The column of the cell.
+        return: bool, True if this was a winning move.
+        """
+        cell = item_x * self.n + item_y
+        mask = self.masks[item] | (1 << cell)
+        self.masks[item] = mask
+        for line in self.lines_by_cell[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def place(self, item, item_x, item_y):
+        """
+        Plot the symbol with value `item` at (item_x, item_y) without checking for a win,
+        for when the win is tracked elsewhere (see `lines.LineCounter`).
+
+        params:
+
+        - item int: The value of the symbol, 1 for 'O' and 2 for 'X'.
+        - item_x int: The row of the cell.
+        - item_y int: The column of the cell.
+        """
+        self.masks[item] |= cell_bit(self.n, item_x, item_y)
+
+    def undo(self, item, item_x, item_y):
+        """
+        Remove the symbol with value `item` from (item_x, item_y).
+
+        params:
+
+        - item int: The value of the symbol, 1 for 'O' and 2 for 'X'.
+        - item_x int: The row of the cell.
+        - item_y int: The column of the cell.
+        """
+        self.masks[item] &= ~cell_bit(self.n, item_x, item_y)
+
+    def has_won(self, item):
+        """
+        Check if the symbol with value `item` has completed any line.
+
+        params:
+
+        - item int: The value of the symbol, 1 for 'O' and 2 for 'X'.
+        """
+        mask = self.masks[item]
+        return any(mask & line == line for line in self.lines)
+
+    def is_full(self):
+        """
+        Checks if there is no vacant space on the board.
+        """
+        return self.occupied == self.full_mask
+
+    def rows(self):
+        """
+        Returns the board as a matrix (nested lists) of 0, 1 and 2 values, like the `board` property of `Board`.
+        """
+        return [
+            [
+                1 if self.masks[1] >> (item_x * self.n + item_y) & 1
+                else 2 if self.masks[2] >> (item_x * self.n + item_y) & 1
+                else 0
+                for item_y in range(self.n)
+            ]
+            for item_x in range(self.n)
+        ]
+
+    def load(self, rows):
+        """
+        Set the masks from a matrix of 0, 1 and 2 values,
+        like the `board` property of `Board`.
+
+        params:
+
+        - rows: An NxN matrix (numpy array or nested lists).
+        """
+        self.reset()
+        for item_x, row in enumerate(rows):
+            for item_y, item in enumerate(row):
+                if item:
+                    self.masks[int(item)] |= cell_bit(self.n, item_x, item_y)
@@ -1,7 +1,33 @@
+from collections import namedtuple
 import numpy as np
+from bitboard import BitBoard
+from encoding import encode_move
+from lines import DIRECTIONS, LineCounter
+from state_index import DRAW, ONGOING, state_index_for
 from utils import log
 
 
+MoveResult = namedtuple('MoveResult', ['winner', 'draw', 'illegal'])
+# The outcome of a move:
+#   - winner: The mark ('X' or 'O') of the winner if the move won the game, otherwise None.
+#   - draw: True if the move filled the board without a winner.
+#   - illegal: True if the move was not made, the cell was occupied or the symbol unknown.
+
+
+def render(board, result, mark, item_x, item_y):
+    """
+    An observer for `Board` which prints the board after each move,
+    and the winner or the draw when the game ends.
+    """
+    if result.illegal:
+        return
+    board.draw_board()
+    if result.winner:
+        print('Winner is: {}'.format(result.winner))
+    elif result.draw:
+        print('Draw')
+
+
 class Board(object):
     """
     The environment for the reinforcement learning project.
@@ -22,16 +48,39 @@ class Board(object):
         - Have a method which lets a user play by plotting a symbol of 'X' or 'O' only! anywhere within the matrix.
         - Calculates if there is a winner after each symbol is plotted.
             - A win is defined by any row, column or diagonal being filled with the same symbol, with the symbol as the winner.
+            - Or, with k given, by k of the same symbol in a row along any of them (gomoku-style).
         - If there is a winner, prints a message for the same.
+
+    The matrix is kept for display and for the agents, the draw checks after each move
+    are done by a `BitBoard` engine which mirrors the matrix and the win checks by
+    a `LineCounter` which counts the symbols in every line as they are plotted.
+    On boards small enough for a `state_index.StateIndex`, the moves of a game played in turn
+    are looked up in the index instead, and the engine and the counter are only brought up to date
+    if a move leaves it (a symbol playing out of turn or after the game is over).
+
+    `step` makes a move and returns a `MoveResult` without printing anything, the observers
+    (functions taking the board, the result, the mark and the cell) are told about every move
+    made through `player_move`. Unless the board is headless, `render` is one of them.
     """
-    def __init__(self, n=3, player_sym='x'):
+    def __init__(self, n=3, player_sym='x', k=None, headless=False, index=True):
         """
         Constructor of the Board class, creates board objects.
 
         - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
         - player_sym(default='x') str: The symbol chosen by a human player.
-        """
+        - k(default=None) int: The number of symbols in a row needed to win, defaults to n.
+        - headless(default=False) bool: If True, moves are not printed.
+        - index(default=True) bool: If True, use the `state_index.StateIndex` of the board when there is one.
+        """
+        self.observers = [] if headless else [render]
+        self.k = k
+        self.use_index = index
+        self.index = None
+        self.position = -1
         self.board = None
+        self.engine = None
+        self.lines = None
+        self.state_code = 0
         self.reset_board(n)
         self.stale = False
         # Initalize the board
@@ -70,6 +119,16 @@ class Board(object):
         Clear the board when the game is to be restarted or a new game has to be started.
         """
         self.board = np.zeros((n, n)).astype(int)
+        self.engine = BitBoard(n, self.k)
+        # The bitwise mirror of the matrix, used for the draw checks.
+        self.lines = LineCounter(n, self.k)
+        # The count of symbols in every line, used for the win checks.
+        self.state_code = 0
+        # The base-3 code of the matrix (see `encoding.encode_board`), updated on each move.
+        self.index = state_index_for(n, self.k) if self.use_index else None
+        self.position = 0 if self.index is not None else -1
+        # The position of the board in the index, -1 when the index isn't used.
+        self.stale = False
         self.winner = None
 
     def draw_char_for_item(self, item):
@@ -102,36 +161,54 @@ class Board(object):
         """
         Prints a human friendly representation of the tic-tac-toe board
         """
-        elements_in_board = self.board.size
-        # Calculate the elements in the board
+        n, _ = self.board.shape
+        indent = ' ' * 12
 
-        items = [
-            self.draw_char_for_item(self.board.item(item_idx))
-            for item_idx in range(elements_in_board)
+        rows = [
+            indent + ' ' + ' | '.join(self.draw_char_for_item(item) for item in row)
+            for row in self.board.tolist()
         ]
         # For each integer cell/element in the matrix, find the character mapped to it
-        # and store in a list.
-        board = """
-             {} | {} | {}
-            -----------
-             {} | {} | {}
-            -----------
-             {} | {} | {}
-        """.format(*items)
-        # The *items expand to N arguments where N is the number of elements in `items`,
-        # which is equal to the number of elements in the matrix, hence the string equivalent
-        # of the board
+        # and join the characters of a row with column separators.
+
+        separator = '\n' + indent + '-' * (4 * n - 1) + '\n'
+        board = '\n' + separator.join(rows) + '\n' + ' ' * 8
+        # Same layout as the 3x3 template:
+        #      X | O | X
+        #     -----------
+        # for any number of rows and columns.
         print(board)
 
-    def have_same_val(self, axis, item, item_x, item_y):
+    def completes_line(self, item, item_x, item_y, directions=DIRECTIONS):
         """
-        Oh boy! without the documentation this would be just 12-14 lines of code.
+        Checks if the cell is part of k (see `lines.LineCounter`) of the integer `item` in a row
+        along any of the `directions`, the same rule `step` uses to find a winner.
 
-        Checks if a row(if axis = 0) of the board matrix has same values throughout.
-                                    or
-        Checks if a column(if axis = 1) of the board matrix has same values throughout.
+        The segments of the `LineCounter` are checked against the board matrix rather than counted,
+        so the answer holds even for moves the counter hasn't seen (see `index_step`).
 
-        This is useful to check if a row or column is filled up by the symbol which was added the latest.
+        params:
+
+        - item int: The latest integer inserted into the matrix at row-index = item_x, and column-index = item_y.
+        - item_x int: The row of the matrix in which item has been inserted.
+        - item_y int: The column of the matrix in which the item has been inserted.
+        - directions(default=lines.DIRECTIONS): The (row step, column step) of the lines to check.
+        """
+        n = len(self.board)
+        cells = self.board.ravel()
+        for segment in self.lines.segments_by_cell[item_x * n + item_y]:
+            segment = self.lines.segments[segment]
+            if len(segment) > 1:
+                (first_x, first_y), (second_x, second_y) = divmod(segment[0], n), divmod(segment[1], n)
+                if (second_x - first_x, second_y - first_y) not in directions:
+                    continue
+            if all(cells[cell] == item for cell in segment):
+                return True
+        return False
+
+    def have_same_val(self, axis, item, item_x, item_y):
+        """
+        Checks if the row(if axis = 0) or the column(if axis = 1) of the latest item has k of it in a row.
 
         params:
 
@@ -142,117 +219,31 @@ class Board(object):
         - item_y int: The column of the matrix in which the item has been inserted.
         - item int: The latest integer inserted into the matrix at row-index = item_x, and column-index = item_y.
         """
-        max_limit, _ = self.board.shape
-        # Get the number of rows in the board.
-
-        result = True
-        # Optimistic approach, assume the result to be true,
-        # unless proven wrong in the further steps.
-
-        row_idx = col_idx = 0
-        # set row_idx and col_idx iteration variables as 0
-        # they don't get used much, they are present for code readability.
-
-        main_idx, fixed_idx, ignore_idx = (col_idx, item_x, item_y) \
-                                            if axis == 0 \
-                                            else (row_idx, item_y, item_x)
-        # main_idx: Update this index each iteration of the loop.
-        # fixed_idx: Don't modify this index ever.
-        # ignore_idx: this is the index of the inserted element
-        #              which doesn't need to be evaluated, so ignore.
-        # The if-else ensures weather to increment the row index
-        # or the column index according to the value of the axis.
-
-        while main_idx < max_limit:
-            # If the main_idx which starts at 0 is less than number of rows/cols in matrix.
-            if main_idx != ignore_idx:
-                # And main_idx is not equal to the index of the latest item inserted (ignore_idx)
-                # because for a fixed_index if we compare main_idx and ignore_idx it would give us the
-                # latest element added, which will be equal to itself.
-                # Learning algorithms are costly, ain't nobady got time fo that!
-
-                board_item = self.board[fixed_idx][main_idx] \
-                    if axis == 0 \
-                    else self.board[main_idx][fixed_idx]
-                # find the item(board_item) in the matrix
-                # corresponding to main_idx and the fixed_index.
-                # It should be an element in the same row or column depending on the axis.
-
-                if board_item != item or board_item == 0:
-                    # If the board_item found is not equal to the latest item added
-                    # or if the board item is 0, which is still not marked by bot or player,
-                    # result is false as the function didn't find all
-                    # values to be same across the row, or column.
-                    # and exit the loop because a single-mismatch is sufficient
-                    # to confirm that all elements are not same.
-                    result = False
-                    break
-            main_idx += 1
-        return result
+        return self.completes_line(item, item_x, item_y, [(0, 1)] if axis == 0 else [(1, 0)])
 
     def left_diagonal_has_same_values(self, item, item_x, item_y):
         """
+        Checks if the left diagonal (top left to bottom right) through the latest item has k of it in a row.
+
         params
 
         - item_x int: The row of the matrix in which item has been inserted.
         - item_y int: The column of the matrix in which the item has been inserted.
         - item int: The latest integer inserted into the matrix at row-index = item_x, and column-index = item_y.
         """
-        i = j = 0
-        # set i, j to 0
-
-        result = True
-        # Optimistic approach, assume the result to be true,
-        # unless proven wrong in the further steps.
-
-        max_limit, _ = self.board.shape
-        # Get the number of rows in the board.
-
-        while i < max_limit:
-            # The row index i is sufficient as i and j are incremented
-            # by same factor resulting in same values (Either would do)
-            if i != item_x:
-                # Avoid checking for the latest item added as that's what we are comparing with
-                if self.board[i][j] != item or self.board[i][j] == 0:
-                    # If the board_item found is not equal to the latest item added
-                    # result is false as the function didn't find all
-                    # values to be same across the row, or column.
-                    # and exit the loop because a single-mismatch is sufficient
-                    # to confirm that all elements are not same.
-                    result = False
-                    break
-            i += 1
-            j += 1
-        return result
+        return self.completes_line(item, item_x, item_y, [(1, 1)])
 
     def right_diagonal_has_same_values(self, item, item_x, item_y):
         """
+        Checks if the right diagonal (top right to bottom left) through the latest item has k of it in a row.
+
         params
 
         - item_x int: The row of the matrix in which item has been inserted.
         - item_y int: The column of the matrix in which the item has been inserted.
         - item int: The latest integer inserted into the matrix at row-index = item_x, and column-index = item_y.
         """
-        result = True
-        max_limit, _ = self.board.shape
-        i = 0
-        j = max_limit - 1
-        while i < max_limit:
-            # The row index i is sufficient as i and j are incremented
-            # by same factor resulting in same values (Either would do)
-            if i != item_x:
-                # Avoid checking for the latest item added as that's what we are comparing with
-                if self.board[i][j] != item or self.board[i][j] == 0:
-                    # If the board_item found is not equal to the latest item added
-                    # result is false as the function didn't find all
-                    # values to be same across the row, or column.
-                    # and exit the loop because a single-mismatch is sufficient
-                    # to confirm that all elements are not same.
-                    result = False
-                    break
-            i += 1
-            j -= 1
-        return result
+        return self.completes_line(item, item_x, item_y, [(1, -1)])
 
     def cols_have_same_values(self, item, item_x, item_y):
         """
@@ -282,7 +273,7 @@ class Board(object):
 
     def element_diagonal_has_same_value(self, item, item_x, item_y):
         """
-        Check if any of the diagonals have same values
+        Check if any of the diagonals through the latest item have same values
 
         params
 
@@ -290,25 +281,12 @@ class Board(object):
         - item_y int: The column of the matrix in which the item has been inserted.
         - item int: The latest integer inserted into the matrix at row-index = item_x, and column-index = item_y.
         """
-        max_limit, _ = self.board.shape
-        if item_x == item_y and item_x + item_y == max_limit - 1:
-            return self.left_diagonal_has_same_values(item, item_x, item_y) or \
-            self.right_diagonal_has_same_values(item, item_x, item_y)
-
-        if item_x == item_y:
-            # elements on the left diagonal have same row and column value.
-            return self.left_diagonal_has_same_values(item, item_x, item_y)
-
-        if item_x + item_y == max_limit - 1:
-            # elements on the right diagonal have sum of the row and column value as the same number.
-            return self.right_diagonal_has_same_values(item, item_x, item_y)
-        # Else, it is not either of the diagonals
-        return False
+        return self.completes_line(item, item_x, item_y, [(1, 1), (1, -1)])
 
     def is_game_over(self, player, item, item_x, item_y):
         """
         Check if the game is over, which is defined by a row, column or diagonal having
-        the same values as the latest inserted integer `item`.
+        k of the latest inserted integer `item` in a row.
 
         params
 
@@ -316,9 +294,7 @@ class Board(object):
         - item_y int: The column of the matrix in which the item has been inserted.
         - item int: The latest integer inserted into the matrix at row-index = item_x, and column-index = item_y.
         """
-        return self.cols_have_same_values(item, item_x, item_y) or \
-                    self.rows_have_same_values(item, item_x, item_y) or \
-                    self.element_diagonal_has_same_value(item, item_x, item_y)
+        return self.completes_line(item, item_x, item_y)
 
     def is_winning_move(self, player, item, item_x, item_y):
         """
@@ -340,25 +316,27 @@ class Board(object):
         """
         Checks if there is no vacant space on the board
         """
-        x, y = np.where(self.board == 0)
-        if len(x) == 0 and len(y) == 0:
+        if self.position >= 0:
+            if not self.index.free[self.position].any():
+                self.stale = True
+        elif self.engine.is_full():
             self.stale = True
         log('is game stale? ', self.stale)
         return self.stale
 
 
-    def player_move(self, input_symbol, item_x, item_y):
+    def step(self, input_symbol, item_x, item_y):
         """
-        The method which facilitates insertion of values into the board matrix.
+        Plot a symbol on the board and find out how the game stands,
+        without printing or logging anything.
 
         params:
 
         - input_symbol: 'X' or 'O'
         - item_x int: The row of the matrix in which item has been inserted.
         - item_y int: The column of the matrix in which the item has been inserted.
+        return: MoveResult
         """
-        symbol = None
-
         if input_symbol == self.sym_o.get('mark'):
             # If 'O' was inserted
             symbol = self.sym_o
@@ -369,21 +347,94 @@ class Board(object):
 
         else:
             # invalid symbol
-            return
-        if self.board[item_x][item_y] == 0:
-            self.board[item_x][item_y] = symbol.get('value')
-            # insert the integer corresponding to the symbol in to the matrix.
-
-            self.draw_board()
-            # Show the board in a human friendly format for evaluation.
-
-            if self.is_winning_move(symbol.get('mark'), symbol.get('value'), item_x, item_y):
-                # If this move was a winning move, declare the symbol as the winner.
-                print('Winner is: {}'.format(self.winner))
-                return self.winner
-            elif self.is_stale():
-                print('Draw')
-                return 'draw'
+            return MoveResult(None, False, True)
+
+        value = symbol.get('value')
+        if self.position >= 0:
+            index = self.index
+            if index.to_move[self.position] == value and index.status[self.position] == ONGOING:
+                return self.index_step(symbol, item_x, item_y)
+            self.leave_index()
+
+        if not self.engine.is_free(item_x, item_y):
+            return MoveResult(None, False, True)
+
+        self.board[item_x][item_y] = value
+        # insert the integer corresponding to the symbol in to the matrix.
+
+        self.state_code = encode_move(self.state_code, len(self.board), value, item_x, item_y)
+        self.engine.place(value, item_x, item_y)
+        # Mirror the move on the bitboard.
+
+        if self.lines.move(value, item_x, item_y):
+            # Count the symbol in the lines through the cell, which tells if it completed one.
+            # If this move was a winning move, declare the symbol as the winner.
+            self.winner = symbol.get('mark')
+            return MoveResult(self.winner, False, False)
+
+        if self.engine.is_full():
+            self.stale = True
+            return MoveResult(None, True, False)
+        return MoveResult(None, False, False)
+
+    def index_step(self, symbol, item_x, item_y):
+        """
+        `step` for a move in turn, by looking up the position it leads to.
+        """
+        position = self.index.successors[self.position, item_x * len(self.board) + item_y]
+        if position < 0:
+            return MoveResult(None, False, True)
+            # The cell is taken.
+        self.position = position
+        self.state_code = int(self.index.codes[position])
+        self.board[item_x][item_y] = symbol.get('value')
+
+        status = self.index.status[position]
+        if status == DRAW:
+            self.stale = True
+            return MoveResult(None, True, False)
+        if status != ONGOING:
+            self.winner = symbol.get('mark')
+            return MoveResult(self.winner, False, False)
+        return MoveResult(None, False, False)
+
+    def leave_index(self):
+        """
+        Stop using the index for the rest of the game, the engine and the line counter
+        are brought up to date with the matrix.
+        """
+        self.position = -1
+        self.engine.load(self.board)
+        self.lines.reset()
+        for (item_x, item_y), item in np.ndenumerate(self.board):
+            if item:
+                self.lines.move(int(item), item_x, item_y)
+
+    def add_observer(self, observer):
+        """
+        Call `observer(board, result, mark, item_x, item_y)` after every move made through `player_move`.
+        """
+        self.observers.append(observer)
+
+    def player_move(self, input_symbol, item_x, item_y):
+        """
+        The method which facilitates insertion of values into the board matrix.
+        Makes the move with `step` and tells the observers about it.
+
+        params:
+
+        - input_symbol: 'X' or 'O'
+        - item_x int: The row of the matrix in which item has been inserted.
+        - item_y int: The column of the matrix in which the item has been inserted.
+        return: The mark of the winner, 'draw' or None if the game goes on.
+        """
+        result = self.step(input_symbol, item_x, item_y)
+        for observer in self.observers:
+            observer(self, result, input_symbol, item_x, item_y)
+        if result.winner:
+            return result.winner
+        elif result.draw:
+            return 'draw'
 
     def play(self, item_x, item_y):
         """
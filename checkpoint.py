@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from persistence import load_agent, snapshot, write_snapshot
+from train import train
+from utils import log
+
+
+PREFIX = 'checkpoint-'
+# Checkpoints are directories named checkpoint-<games played>, holding:
+#   - bot1.tttq, bot2.tttq: The agents, see `persistence.save_agent`.
+#   - run.json: The games played, the wins, the state of numpy's random generator and
+#     the number of records in the experience log, if there is one.
+
+
+def checkpoints(directory):
+    """
+    Returns the complete checkpoints in a directory, oldest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    names = [
+        name for name in os.listdir(directory)
+        if name.startswith(PREFIX) and name[len(PREFIX):].isdigit()
+    ]
+    # Checkpoints still being written end with '.tmp' and are skipped.
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def write_checkpoint(path, copies, run_state):
+    """
+    Write a checkpoint into a temporary directory and rename it into place,
+    a checkpoint directory either is complete or doesn't exist.
+
+    params:
+
+    - path str: The checkpoint directory.
+    - copies list: The `persistence.snapshot` of each agent.
+    - run_state dict: The contents of run.json.
+    """
+    temp_path = '{}.tmp'.format(path)
+    if os.path.isdir(temp_path):
+        shutil.rmtree(temp_path)
+        # Left behind by a run that died while writing.
+    os.makedirs(temp_path)
+    for name, copy in zip(('bot1.tttq', 'bot2.tttq'), copies):
+        write_snapshot(copy, os.path.join(temp_path, name))
+    with open(os.path.join(temp_path, 'run.json'), 'w') as f:
+        json.dump(run_state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class TrainingRun(object):
+    """
+    Self-play training which can be stopped at any time and continued later.
+
+    Every `checkpoint_every` games the tables and the hyperparameters (including the decayed
+    `exploration_rate`) of both agents are copied and written to `directory` by a background
+    thread while the games go on. Constructing a run on a directory with checkpoints
+    continues from the latest one:
+
+        run = TrainingRun('runs/3x3', Agent(sym='X'), Agent(sym='O'))
+        run.run(1000000)
+        # If the process dies, the same two lines pick up where the last checkpoint left off.
+    """
+    def __init__(self, directory, bot1, bot2, checkpoint_every=10000, keep=3, k=None, experience=None):
+        """
+        params:
+
+        - directory str: Where to write the checkpoints, created if it doesn't exist.
+        - bot1, bot2 Agent: The agents for a new run, replaced by the ones of the latest checkpoint
+                if there is one.
+        - checkpoint_every(default=10000) int: The number of games between checkpoints.
+        - keep(default=3) int: The number of checkpoints to keep, older ones are deleted.
+        - k(default=None) int: See `train.train`.
+        - experience(default=None): See `train.train`.
+        """
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.keep = keep
+        self.k = k
+        self.experience = experience
+        self.bot1 = bot1
+        self.bot2 = bot2
+        self.played = 0
+        self.wins = [0, 0]
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+        # The checkpoint being written, at most one at a time.
+        os.makedirs(directory, exist_ok=True)
+        self.restore()
+
+    def restore(self):
+        """
+        Load the latest checkpoint, if there is one.
+
+        return: bool, True if a checkpoint was loaded.
+        """
+        found = checkpoints(self.directory)
+        if not found:
+            return False
+        path = found[-1]
+        with open(os.path.join(path, 'run.json')) as f:
+            run_state = json.load(f)
+
+        bots = []
+        for bot, name in ((self.bot1, 'bot1.tttq'), (self.bot2, 'bot2.tttq')):
+            loaded = load_agent(os.path.join(path, name), mmap=False)
+            loaded.strategy = bot.strategy
+            loaded.cache = bot.cache
+            loaded.min_exploration_rate = bot.min_exploration_rate
+            # Only the table and the hyperparameters are saved, keep the rest of the agent given.
+            bots.append(loaded)
+        self.bot1, self.bot2 = bots
+        self.played = run_state['played']
+        self.wins = run_state['wins']
+        rng_state = run_state['rng']
+        np.random.set_state((rng_state[0], np.array(rng_state[1], dtype=np.uint32)) + tuple(rng_state[2:]))
+        if self.experience is not None and run_state.get('experience') is not None:
+            self.experience.truncate(run_state['experience'])
+            # The games logged after the checkpoint are played again from it.
+        log('resumed {} at {} games'.format(path, self.played))
+        return True
+
+    def checkpoint(self):
+        """
+        Copy the agents and start writing them in the background.
+        Waits for the previous checkpoint to be written first.
+        """
+        self.wait()
+        copies = [snapshot(self.bot1), snapshot(self.bot2)]
+        rng_state = np.random.get_state()
+        run_state = {
+            'played': self.played,
+            'wins': list(self.wins),
+            'rng': [rng_state[0], rng_state[1].tolist()] + list(rng_state[2:]),
+            'experience': None if self.experience is None else self.experience.records(),
+        }
+        path = os.path.join(self.directory, '{}{:012d}'.format(PREFIX, self.played))
+        self.pending = self.writer.submit(self.write, path, copies, run_state)
+
+    def write(self, path, copies, run_state):
+        write_checkpoint(path, copies, run_state)
+        for old in checkpoints(self.directory)[:-self.keep]:
+            shutil.rmtree(old)
+
+    def wait(self):
+        """
+        Block until the checkpoint being written is on disk, raises its error if it failed.
+        """
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            pending.result()
+
+    def run(self, epochs):
+        """
+        Train until `epochs` games have been played in total, over all the resumed runs.
+
+        return: tuple(int, int), the wins of bot1 and bot2 in the whole run.
+        """
+        try:
+            while self.played < epochs:
+                games = min(self.checkpoint_every, epochs - self.played)
+                wins = train(games, self.bot1, self.bot2, k=self.k, experience=self.experience)
+                self.wins = [total + won for total, won in zip(self.wins, wins)]
+                self.played += games
+                if self.experience is not None:
+                    self.experience.flush()
+                    # The log must hold every game the checkpoint has learned from.
+                self.checkpoint()
+                log('training run: {}/{} games'.format(self.played, epochs))
+        finally:
+            self.wait()
+        return self.wins[0], self.wins[1]
@@ -0,0 +1,75 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import sys
+
+
+MODES = {
+    'train': ('train', 'Train two agents by self-play.'),
+    'evaluate': ('evaluate', 'Rate agents by playing them against each other.'),
+    'serve': ('server', 'Serve games against a trained agent.'),
+}
+# mode -> (the module with its `add_arguments` and `run`, description)
+#
+# Only the module of the chosen mode is imported, so nothing heavier than the standard library
+# is loaded before the mode needs it, and this module stays cheap to import for worker processes
+# started with the 'spawn' or 'forkserver' methods, which import the main module of the parent.
+
+
+def load_config(path, mode):
+    """
+    Read the options of a mode from a JSON config file, e.g.
+
+        {
+            "train": {"epochs": 100000, "checkpoint_dir": "runs/3x3"},
+            "serve": {"agent": "runs/x.tttq", "port": 9000}
+        }
+
+    The keys are the names of the command line options with '_' for '-',
+    options given on the command line win over the file.
+
+    return: dict of the options of the mode.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    return config.get(mode, {})
+
+
+def main(argv=None):
+    """
+    Run training, evaluation or the game server without prompts:
+
+        python cli.py train --epochs 100000 --save-x x.tttq --save-o o.tttq
+        python cli.py --config run.json serve
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description='Tic-tac-toe agents, headless.')
+    parser.add_argument('--config', default=None, help='a JSON file of options per mode')
+    parser.add_argument('--start-method', default=None, choices=['fork', 'spawn', 'forkserver'],
+                        help='how worker processes are started')
+    parser.add_argument('mode', choices=sorted(MODES))
+    args, rest = parser.parse_known_args(argv)
+
+    if args.start_method:
+        multiprocessing.set_start_method(args.start_method)
+    module_name, description = MODES[args.mode]
+    module = importlib.import_module(module_name)
+
+    mode_parser = argparse.ArgumentParser(prog='cli.py {}'.format(args.mode), description=description)
+    module.add_arguments(mode_parser)
+    if args.config:
+        options = load_config(args.config, args.mode)
+        known = {action.dest for action in mode_parser._actions}
+        unknown = set(options) - known
+        if unknown:
+            parser.error('unknown options for {} in {}: {}'.format(args.mode, args.config, ', '.join(sorted(unknown))))
+        mode_parser.set_defaults(**options)
+    mode_args = mode_parser.parse_args(rest)
+    if hasattr(module, 'check_arguments'):
+        module.check_arguments(mode_parser, mode_args)
+    return module.run(mode_args)
+
+
+if __name__ == '__main__':
+    main()
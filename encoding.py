@@ -0,0 +1,93 @@
+_WEIGHTS = {}
+# Cache of the base-3 place value of every cell per board size.
+
+
+def cell_weights(n):
+    """
+    Returns the base-3 place value of each cell of an NxN board,
+    the cells are numbered row by row.
+
+    The first cell is the most significant digit, so the code of a board is the
+    same number that the string "012..." of its cells would be when read in base-3.
+
+    params:
+
+    - n int: The number of rows and columns in the tic-tac-toe board.
+    return: list(int)
+    """
+    if n not in _WEIGHTS:
+        cells = n * n
+        _WEIGHTS[n] = [3 ** (cells - 1 - cell) for cell in range(cells)]
+    return _WEIGHTS[n]
+
+
+def encode_board(board):
+    """
+    Convert the matrix
+
+        [
+            [0, 1, 2],
+            [0, 0, 1],
+            [2, 0, 0],
+        ]
+
+        to the integer 012001200 read in base-3, i.e. 1 * 3^7 + 2 * 3^6 + ... = 3690
+
+    params:
+
+    - board: An NxN matrix (numpy array or nested lists) of 0, 1 and 2 values.
+    return: int
+    """
+    cells = board.ravel().tolist() if hasattr(board, 'ravel') else [
+        item for row in board for item in row
+    ]
+    code = 0
+    for item in cells:
+        code = code * 3 + item
+    return code
+
+
+def encode_move(code, n, item, item_x, item_y):
+    """
+    Update the code of a board for a symbol plotted on a vacant cell,
+    without looking at the rest of the board.
+
+    params:
+
+    - code int: The code of the board before the move.
+    - n int: The number of rows and columns in the tic-tac-toe board.
+    - item int: The value of the symbol, 1 for 'O' and 2 for 'X'.
+    - item_x int: The row of the cell.
+    - item_y int: The column of the cell.
+    return: int
+    """
+    return code + item * cell_weights(n)[item_x * n + item_y]
+
+
+def decode_board(code, n):
+    """
+    Convert a code back to the list of cell values of the board, row by row.
+
+    params:
+
+    - code int: The code of the board.
+    - n int: The number of rows and columns in the tic-tac-toe board.
+    return: list(int)
+    """
+    cells = []
+    for _ in range(n * n):
+        code, item = divmod(code, 3)
+        cells.append(item)
+    return cells[::-1]
+
+
+def convert_string_keys(states):
+    """
+    Convert a table keyed by the old string format ("012001200") to integer codes.
+
+    params:
+
+    - states dict: The table with string keys.
+    return: dict
+    """
+    return {int(key, 3): value for key, value in states.items()}
@@ -0,0 +1,344 @@
+import argparse
+import json
+import math
+import multiprocessing
+import sys
+import numpy as np
+from board import Board
+from utils import log
+
+
+class RandomPlayer(object):
+    """
+    A baseline which plays a random vacant cell, with the interface of `Agent` used for playing.
+    """
+    def __init__(self, sym, n=3):
+        self.sym = sym
+        self.n = n
+
+    def get_serious(self):
+        pass
+
+    def select_move(self, board, state_key=None):
+        cells = np.flatnonzero(np.ravel(board) == 0)
+        return divmod(int(cells[np.random.randint(len(cells))]), self.n)
+
+
+class Entrant(object):
+    """
+    A contestant of a tournament: a name and a player for each symbol.
+
+    An `Agent` only knows the boards of the symbol it was trained as, so an entrant
+    is usually the pair of agents from one training run (or one checkpoint of it),
+    `players['X']` plays the games where the entrant moves first.
+    """
+    def __init__(self, name, x_player, o_player):
+        """
+        params:
+
+        - name str: The name in the reports.
+        - x_player: The player for 'X', an `Agent`, `solver.SolvedAgent` or `RandomPlayer`.
+        - o_player: The player for 'O'.
+        """
+        self.name = name
+        self.players = {'X': x_player, 'O': o_player}
+
+    @classmethod
+    def random(cls, n=3):
+        return cls('random', RandomPlayer('X', n), RandomPlayer('O', n))
+
+    @classmethod
+    def mcts(cls, n=3, playouts=1000):
+        from mcts import MCTSPlayer
+        return cls('mcts', MCTSPlayer('X', n, playouts=playouts), MCTSPlayer('O', n, playouts=playouts))
+
+    @classmethod
+    def solved(cls, n=3):
+        from solver import Solver, SolvedAgent
+        table = Solver(n).solve()
+        return cls('solved', SolvedAgent('X', n, table=table), SolvedAgent('O', n, table=table))
+
+
+def play_game(x_player, o_player, n=3, k=None):
+    """
+    Play one game without learning from it.
+
+    return: 'X' or 'O' for the winner, None for a draw.
+    """
+    game = Board(n=n, k=k, headless=True)
+    players = (x_player, o_player)
+    turn = 0
+    while True:
+        player = players[turn % 2]
+        result = game.step(player.sym, *player.select_move(game.board, game.state_code))
+        if result.winner or result.draw:
+            break
+        turn += 1
+    for player in players:
+        if hasattr(player, 'state_order'):
+            player.state_order = []
+            # Agents record their moves to learn from, drop them.
+    return result.winner
+
+
+_ENTRANTS = None
+# The entrants of a tournament, sent once to each worker process.
+
+
+def _init_worker(entrants):
+    global _ENTRANTS
+    _ENTRANTS = entrants
+    for entrant in entrants:
+        for player in entrant.players.values():
+            player.get_serious()
+
+
+def play_games(job):
+    """
+    Runs in a worker process: play games between two entrants, half with each as 'X'.
+
+    params:
+
+    - job tuple: (index of the first entrant, index of the second, games, n, k, seed)
+    return: tuple(int, int, int), the wins, draws and losses of the first entrant.
+    """
+    first, second, games, n, k, seed = job
+    np.random.seed(seed)
+    first, second = _ENTRANTS[first], _ENTRANTS[second]
+    for entrant in (first, second):
+        for player in entrant.players.values():
+            if hasattr(player, 'rng'):
+                player.rng.seed(seed)
+                # Players with a generator of their own (`mcts.MCTSPlayer`) would repeat the same games in every job.
+    wins = draws = losses = 0
+    for idx in range(games):
+        if idx % 2 == 0:
+            winner = play_game(first.players['X'], second.players['O'], n, k)
+            first_sym = 'X'
+        else:
+            winner = play_game(second.players['X'], first.players['O'], n, k)
+            first_sym = 'O'
+        if winner is None:
+            draws += 1
+        elif winner == first_sym:
+            wins += 1
+        else:
+            losses += 1
+    return wins, draws, losses
+
+
+def score_interval(wins, draws, losses, z=1.96):
+    """
+    The mean score of a player (1 for a win, 0.5 for a draw, 0 for a loss) and its
+    Wilson score interval, with a draw counted as half a win.
+
+    Unlike the normal approximation, the interval doesn't shrink to nothing when every game
+    is a draw or every game is won, so a handful of such games doesn't settle a matchup.
+
+    return: tuple(score, low, high)
+    """
+    if not wins + draws + losses:
+        return 0.5, 0.0, 1.0
+    return rate_interval(wins + 0.5 * draws, wins + draws + losses, z)
+
+
+def rate_interval(count, games, z=1.96):
+    """
+    The Wilson score interval of a rate, e.g. of draws.
+
+    return: tuple(rate, low, high)
+    """
+    if not games:
+        return 0.0, 0.0, 1.0
+    rate = count / games
+    denominator = 1 + z ** 2 / games
+    center = (rate + z ** 2 / (2 * games)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / games + z ** 2 / (4 * games ** 2)) / denominator
+    return rate, max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+def settled(wins, draws, losses, z=1.96, tolerance=0.02):
+    """
+    True once more games won't change the verdict of a matchup: the confidence interval
+    of the score excludes an even score, or it is narrower than `tolerance` either side of it.
+    """
+    score, low, high = score_interval(wins, draws, losses, z)
+    return low > 0.5 or high < 0.5 or (high - low) / 2 < tolerance
+
+
+def elo_ratings(names, matchups, iterations=200, base=1500):
+    """
+    Fit Elo ratings to the results of all the matchups (Bradley-Terry, a draw counts as half a win).
+
+    Every pair that played also gets one virtual draw, so an entrant that never scored
+    still gets a finite rating.
+
+    params:
+
+    - names list(str): The entrants.
+    - matchups list(dict): The matchups of `tournament`.
+    - iterations(default=200) int: The rounds of the minorization-maximization updates.
+    - base(default=1500) int: The mean rating.
+    return: dict of name to rating.
+    """
+    index = {name: idx for idx, name in enumerate(names)}
+    count = len(names)
+    scores = np.zeros(count)
+    games = np.zeros((count, count))
+    for matchup in matchups:
+        first, second = index[matchup['players'][0]], index[matchup['players'][1]]
+        played = matchup['games'] + 1
+        scores[first] += matchup['wins'] + 0.5 * matchup['draws'] + 0.5
+        scores[second] += matchup['losses'] + 0.5 * matchup['draws'] + 0.5
+        games[first, second] += played
+        games[second, first] += played
+
+    strength = np.ones(count)
+    for _ in range(iterations):
+        pairs = games / (strength[:, None] + strength[None, :])
+        strength = np.where(scores > 0, scores / np.maximum(pairs.sum(axis=1), 1e-12), strength)
+        strength /= np.exp(np.log(strength).mean())
+    ratings = 400 * np.log10(strength)
+    return {name: float(base + ratings[index[name]]) for name in names}
+
+
+def tournament(entrants, mode='round-robin', games=1000, batch=100, workers=None,
+               n=3, k=None, z=1.96, tolerance=0.02, seed=None):
+    """
+    Play matchups between entrants over a pool of worker processes, without exploration.
+
+    Each matchup is played in rounds of `batch` games spread over the workers, and stops
+    once its result is `settled` or after `games` games.
+
+    params:
+
+    - entrants list(Entrant): The contestants, names must be unique.
+    - mode(default='round-robin') str: 'round-robin' for every pair of entrants,
+            'gauntlet' for the first entrant against each of the others.
+    - games(default=1000) int: The most games in a matchup.
+    - batch(default=100) int: The games in a matchup between checks for stopping.
+    - workers(default=None) int: The number of processes, defaults to the number of CPUs.
+    - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+    - k(default=None) int: The number of symbols in a row needed to win, defaults to `n`.
+    - z(default=1.96) float: The z-score of the confidence intervals, 1.96 for 95%.
+    - tolerance(default=0.02) float: See `settled`.
+    - seed(default=None) int: Seed for the workers' random number generators.
+    return: dict with the 'matchups' and the Elo 'ratings'.
+    """
+    if mode == 'round-robin':
+        pairs = [(first, second) for first in range(len(entrants)) for second in range(first + 1, len(entrants))]
+    elif mode == 'gauntlet':
+        pairs = [(0, second) for second in range(1, len(entrants))]
+    else:
+        raise ValueError('Unknown tournament mode {}'.format(mode))
+
+    workers = workers or multiprocessing.cpu_count()
+    rng = np.random.RandomState(seed)
+    results = {pair: [0, 0, 0] for pair in pairs}
+    active = list(pairs)
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(entrants,)) as pool:
+        while active:
+            jobs, owners = [], []
+            for pair in active:
+                played = sum(results[pair])
+                remaining = min(batch, games - played)
+                chunk = max(2, -(-remaining // workers))
+                # Spread each matchup's round over the workers, in even chunks so both sides get each color.
+                chunk += chunk % 2
+                for start in range(0, remaining, chunk):
+                    jobs.append((pair[0], pair[1], min(chunk, remaining - start), n, k, rng.randint(2 ** 31)))
+                    owners.append(pair)
+
+            for pair, counts in zip(owners, pool.map(play_games, jobs)):
+                results[pair] = [total + count for total, count in zip(results[pair], counts)]
+
+            active = [
+                pair for pair in active
+                if sum(results[pair]) < games and not settled(*results[pair], z=z, tolerance=tolerance)
+            ]
+            log('tournament: {} matchups still running'.format(len(active)))
+
+    matchups = []
+    for pair in pairs:
+        wins, draws, losses = results[pair]
+        played = wins + draws + losses
+        score, low, high = score_interval(wins, draws, losses, z)
+        matchups.append({
+            'players': [entrants[pair[0]].name, entrants[pair[1]].name],
+            'games': played,
+            'wins': wins,
+            'draws': draws,
+            'losses': losses,
+            'win_rate': rate_interval(wins, played, z),
+            'draw_rate': rate_interval(draws, played, z),
+            'loss_rate': rate_interval(losses, played, z),
+            'score': [score, low, high],
+            'stopped_early': played < games,
+        })
+    names = [entrant.name for entrant in entrants]
+    return {'matchups': matchups, 'ratings': elo_ratings(names, matchups)}
+
+
+def format_report(report):
+    """
+    The ratings and matchups of `tournament` as a text table.
+    """
+    lines = ['{:<20} {:>8}'.format('entrant', 'elo')]
+    for name, rating in sorted(report['ratings'].items(), key=lambda item: -item[1]):
+        lines.append('{:<20} {:>8.1f}'.format(name, rating))
+    lines.append('')
+    lines.append('{:<30} {:>6} {:>17} {:>17} {:>17}'.format('matchup', 'games', 'win', 'draw', 'loss'))
+    for matchup in report['matchups']:
+        rates = [
+            '{:.2f} [{:.2f},{:.2f}]'.format(*matchup[key])
+            for key in ('win_rate', 'draw_rate', 'loss_rate')
+        ]
+        lines.append('{:<30} {:>6} {:>17} {:>17} {:>17}'.format(
+            ' vs '.join(matchup['players']), matchup['games'], *rates
+        ))
+    return '\n'.join(lines)
+
+
+def add_arguments(parser):
+    """
+    The options of `run`, shared with the `cli.py` entry point.
+    """
+    parser.add_argument('--entrant', nargs=3, action='append', default=[], metavar=('NAME', 'X_AGENT', 'O_AGENT'),
+                        help='an entrant from two files saved by persistence.save_agent, repeatable')
+    parser.add_argument('--baselines', nargs='*', default=['random', 'solved'], choices=['random', 'solved', 'mcts'])
+    parser.add_argument('--mode', default='round-robin', choices=['round-robin', 'gauntlet'])
+    parser.add_argument('--games', type=int, default=1000, help='most games per matchup')
+    parser.add_argument('--batch', type=int, default=100, help='games per matchup between stopping checks')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+
+
+def run(args):
+    from persistence import load_agent
+    entrants = [Entrant(name, load_agent(x_path), load_agent(o_path)) for name, x_path, o_path in args.entrant]
+    n = entrants[0].players['X'].n if entrants else 3
+    for baseline in args.baselines:
+        entrants.append(getattr(Entrant, baseline)(n))
+
+    report = tournament(
+        entrants, mode=args.mode, games=args.games, batch=args.batch,
+        workers=args.workers, n=n, seed=args.seed
+    )
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rate agents by playing them against each other.')
+    add_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import os
+import numpy as np
+
+
+RECORD = np.dtype([
+    ('episode', '<u4'),
+    ('state', '<u8'),
+    ('action', '<u2'),
+    ('player', 'u1'),
+    ('outcome', 'i1'),
+])
+# One move per record, 16 bytes:
+#   - episode: The number of the game in the log.
+#   - state: The code of the board (as stored in `Agent.states`) the move was made on.
+#   - action: The cell played, row * N + column.
+#   - player: The value of the symbol of the agent, 1 for 'O' and 2 for 'X'.
+#   - outcome: The reward the agent got at the end of the game.
+
+
+class ExperienceLog(object):
+    """
+    An append-only binary log of the moves of every game, written as the games end.
+
+    The trajectories recorded here can be replayed with `replay` to train agents
+    again without playing the games again.
+    """
+    def __init__(self, path, n=3, buffer_size=4096):
+        """
+        params:
+
+        - path str: The file to append to, created if it doesn't exist.
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        - buffer_size(default=4096) int: The number of records to hold before writing them out.
+        """
+        if 3 ** (n * n) > 2 ** 64:
+            raise ValueError('Codes of a {0}x{0} board do not fit in the log format'.format(n))
+        self.path = path
+        self.n = n
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.file = open(path, 'ab')
+        size = self.file.seek(0, os.SEEK_END)
+        if size % RECORD.itemsize:
+            self.file.truncate(size - size % RECORD.itemsize)
+            self.file.seek(0, os.SEEK_END)
+            # Drop the record cut short by a process killed while writing it.
+        self.episode = self.next_episode()
+
+    def next_episode(self):
+        """
+        The number of the game after the last one in the file, to continue the episode numbers of an existing log.
+        """
+        if os.path.getsize(self.path) < RECORD.itemsize:
+            return 0
+        return int(np.memmap(self.path, dtype=RECORD, mode='r')[-1]['episode']) + 1
+
+    def record(self, agent, reward):
+        """
+        Log the moves the agent made in the current game, call it before `agent.on_reward`
+        which consumes them.
+
+        params:
+
+        - agent Agent: The agent which is about to be rewarded.
+        - reward int: The reward for the game.
+        """
+        for state_key, (item_x, item_y) in agent.state_order:
+            self.buffer.append((self.episode, state_key, item_x * self.n + item_y, agent.value, reward))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def end_episode(self):
+        """
+        Mark the end of a game, the next records belong to a new game.
+        """
+        self.episode += 1
+
+    def flush(self):
+        if self.buffer:
+            np.array(self.buffer, dtype=RECORD).tofile(self.file)
+            self.buffer = []
+        self.file.flush()
+
+    def records(self):
+        """
+        The number of records logged so far, written out or not.
+        """
+        return self.file.tell() // RECORD.itemsize + len(self.buffer)
+
+    def truncate(self, records):
+        """
+        Drop every record after the first `records`, e.g. the games played after the
+        checkpoint a training run resumes from (see `checkpoint.TrainingRun`).
+        """
+        self.flush()
+        self.file.truncate(min(records, self.records()) * RECORD.itemsize)
+        self.file.seek(0, os.SEEK_END)
+        self.episode = self.next_episode()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def episodes(path, chunk_size=65536):
+    """
+    Read the games from a log one at a time, holding at most `chunk_size` records
+    (and the game which is split across chunks) in memory.
+
+    params:
+
+    - path str: The log file.
+    - chunk_size(default=65536) int: The number of records read at a time.
+    return: generator of record arrays, one per game.
+    """
+    count = os.path.getsize(path) // RECORD.itemsize
+    if not count:
+        return
+    records = np.memmap(path, dtype=RECORD, mode='r', shape=(count,))
+    # A record cut short at the end of the file is left out.
+    pending = records[:0]
+    for start in range(0, len(records), chunk_size):
+        chunk = np.concatenate([pending, records[start:start + chunk_size]])
+        boundaries = np.flatnonzero(np.diff(chunk['episode'].astype(np.int64))) + 1
+        for episode in np.split(chunk, boundaries)[:-1]:
+            yield episode
+        pending = chunk[boundaries[-1]:] if len(boundaries) else chunk
+        # The last game of the chunk may continue in the next one.
+    if len(pending):
+        yield pending
+
+
+def replay(path, bots, chunk_size=65536):
+    """
+    Train agents on the games of a log, in the order they were played.
+
+    The agents should be set up like the ones that played the games (board size and symmetry),
+    as the states and actions are logged the way those agents stored them.
+
+    params:
+
+    - path str: The log file.
+    - bots list(Agent): The agents to train, each gets the moves logged for its symbol.
+    - chunk_size(default=65536) int: The number of records read at a time.
+    return: int, the number of games replayed.
+    """
+    by_value = {bot.value: bot for bot in bots}
+    count = 0
+    for episode in episodes(path, chunk_size=chunk_size):
+        players = episode['player']
+        for value in players[np.sort(np.unique(players, return_index=True)[1])]:
+            # Reward the agents in the same order as they were in the game.
+            bot = by_value.get(int(value))
+            if bot is None:
+                continue
+            moves = episode[players == value]
+            bot.state_order = [
+                (int(state), divmod(int(action), bot.n))
+                for state, action in zip(moves['state'], moves['action'])
+            ]
+            bot.on_reward(int(moves['outcome'][0]))
+        count += 1
+    return count
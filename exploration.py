@@ -0,0 +1,93 @@
+import math
+import numpy as np
+from utils import log
+
+
+class EpsilonGreedy(object):
+    """
+    Explore with a probability of `agent.exploration_rate`, exploit otherwise.
+    States the agent has no experience of are always explored.
+    http://home.deib.polimi.it/restelli/MyWebSite/pdf/rl5.pdf
+    http://tokic.com/www/tokicm/publikationen/papers/AdaptiveEpsilonGreedyExploration.pdf
+    """
+    def choose(self, agent, board, state_key, transform=None, position=-1):
+        """
+        Returns the cell (row, column) to play.
+
+        params:
+        - agent Agent: The agent making the move.
+        - board: The matrix of the tic-tac-toe board.
+        - state_key int: The code of the board, canonical if the agent uses symmetry.
+        - transform(default=None): The symmetry which turns the board into the canonical board.
+        - position(default=-1): The position of the board in `agent.index`, -1 if unknown.
+        """
+        p = np.random.random()
+        exploration = p < agent.exploration_rate
+        log(p, '<', agent.exploration_rate)
+        if exploration:
+            log('Exploration turn')
+            return agent.explore_board(board, state_key=state_key, transform=transform, position=position)
+        if state_key not in agent.states:
+            log('No experience for this state: explore')
+            return agent.explore_board(board, state_key=state_key, transform=transform, position=position)
+        log('Using previous experience')
+        return agent.exploit_board(state_key, board, transform=transform, position=position)
+
+
+class Boltzmann(object):
+    """
+    Softmax exploration: play each vacant cell with a probability that grows with its value,
+    `temperature` sets how strongly the better cells are preferred.
+    States the agent has no experience of are explored, and once the agent is
+    serious (exploration_rate of 0) it always plays the best cell.
+    """
+    def __init__(self, temperature=0.1):
+        self.temperature = temperature
+
+    def choose(self, agent, board, state_key, transform=None, position=-1):
+        if state_key not in agent.states:
+            return agent.explore_board(board, state_key=state_key, transform=transform, position=position)
+        if agent.exploration_rate == 0:
+            return agent.exploit_board(state_key, board, transform=transform, position=position)
+
+        cells = agent.vacant_cells(board, position=position)
+        values = agent.states[state_key]
+        if transform is not None:
+            values = agent.symmetry.original_values(transform, values)
+        values = np.ravel(values)[cells] / self.temperature
+        weights = np.exp(values - values.max())
+        # Shift by the max so the exponent can't overflow.
+        cell = np.random.choice(cells, p=weights / weights.sum())
+        return divmod(int(cell), agent.n)
+
+
+class UCB(object):
+    """
+    Count based exploration (upper confidence bound): the value of each vacant cell
+    gets a bonus which shrinks the more often the cell has been played in that state,
+    so cells that were rarely tried get tried again. Cells never played come first.
+    Once the agent is serious (exploration_rate of 0) it always plays the best cell.
+    """
+    def __init__(self, c=1.0):
+        self.c = c
+        self.counts = {}
+        # state code -> number of times each cell was played from it (of the canonical board).
+
+    def choose(self, agent, board, state_key, transform=None, position=-1):
+        if agent.exploration_rate == 0 and state_key in agent.states:
+            return agent.exploit_board(state_key, board, transform=transform, position=position)
+
+        cells = agent.vacant_cells(board, position=position)
+        counts = self.counts.setdefault(state_key, np.zeros(agent.n * agent.n, dtype=np.int64))
+        values = agent.states.get(state_key)
+        values = np.zeros(agent.n * agent.n) if values is None else np.ravel(values)
+        canonical = cells if transform is None else agent.symmetry.inverse[transform][cells]
+        # The table and the counts are in the orientation of the canonical board.
+
+        tried = counts[canonical]
+        bonus = self.c * np.sqrt(math.log(tried.sum() + 1) / np.maximum(tried, 1))
+        scores = np.where(tried == 0, np.inf, values[canonical] + bonus)
+        best = np.flatnonzero(scores == scores.max())
+        choice = best[np.random.randint(len(best))]
+        counts[canonical[choice]] += 1
+        return divmod(int(cells[choice]), agent.n)
@@ -0,0 +1,92 @@
+import asyncio
+import numpy as np
+
+
+class MicroBatcher(object):
+    """
+    Collects the move requests of many games and answers them together with `Agent.exploit_boards`,
+    one table gather and one masked argmax per batch instead of one per request.
+
+    A batch is sent when `max_batch` requests are waiting, or `window` seconds after
+    the first request of the batch arrived, whichever comes first. So a request waits
+    at most `window` seconds plus the time to resolve its batch.
+
+        batcher = MicroBatcher(agent, window=0.002)
+        item_x, item_y = await batcher.policy(board)
+
+    Like `Agent.policy` it never explores or records moves, the agent is only read.
+    """
+    def __init__(self, agent, window=0.002, max_batch=256, executor=None):
+        """
+        params:
+
+        - agent Agent: The trained agent which picks the moves.
+        - window(default=0.002) float: The longest time in seconds a batch waits for more requests.
+        - max_batch(default=256) int: The number of requests which are sent at once without waiting.
+        - executor(default=None): The `concurrent.futures` executor to resolve batches on,
+                None for the default executor of the event loop.
+        """
+        self.agent = agent
+        self.window = window
+        self.max_batch = max_batch
+        self.executor = executor
+        self.pending = []
+        # (board, future) of the requests waiting for the next batch.
+        self.timer = None
+        self.batches = 0
+        self.requests = 0
+
+    async def policy(self, board):
+        """
+        The move of the agent for the board, resolved with the next batch.
+
+        params:
+
+        - board: The NxN matrix of the tic-tac-toe board.
+        return: tuple(int, int), the row and column to play.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((board, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """
+        Send the waiting requests as one batch.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        self.batches += 1
+        self.requests += len(pending)
+
+        boards = np.array([board for board, _ in pending])
+        batch = asyncio.get_running_loop().run_in_executor(self.executor, self.agent.exploit_boards, boards)
+        batch.add_done_callback(lambda done: self.resolve(pending, done))
+
+    @staticmethod
+    def resolve(pending, done):
+        error = done.exception()
+        moves = [None] * len(pending) if error else done.result()
+        for (_, future), move in zip(pending, moves):
+            if future.done():
+                continue
+                # The request was cancelled, e.g. its client went away.
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(move)
+
+    @property
+    def mean_batch(self):
+        """
+        The mean number of requests per batch so far.
+        """
+        return self.requests / self.batches if self.batches else 0.0
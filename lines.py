@@ -0,0 +1,113 @@
+_SEGMENTS = {}
+# Cache of the winning segments per (board size, length to win).
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+# Along a row, along a column, along the left diagonal and along the right diagonal.
+
+
+def segments(n, k=None):
+    """
+    Returns every run of `k` cells in a straight line on an NxN board,
+    along with the runs that pass through each of the cells.
+
+    With k = n these are the rows, columns and the two diagonals of tic-tac-toe,
+    with k < n every window of k cells along them counts (gomoku-style k-in-a-row).
+
+    params:
+
+    - n int: The number of rows and columns in the board.
+    - k(default=None) int: The number of marks in a row needed to win, defaults to n.
+    return: tuple(list(tuple(int)), list(list(int)))
+        - The cell indices (x * n + y) of each segment.
+        - For each cell index, the indices of the segments which contain that cell.
+    """
+    k = n if k is None else k
+    if (n, k) in _SEGMENTS:
+        return _SEGMENTS[(n, k)]
+
+    found = []
+    for item_x in range(n):
+        for item_y in range(n):
+            for step_x, step_y in DIRECTIONS:
+                end_x = item_x + step_x * (k - 1)
+                end_y = item_y + step_y * (k - 1)
+                if 0 <= end_x < n and 0 <= end_y < n:
+                    found.append(tuple(
+                        (item_x + step_x * i) * n + item_y + step_y * i
+                        for i in range(k)
+                    ))
+                # Each segment is found once, from its first cell.
+
+    by_cell = [[] for _ in range(n * n)]
+    for idx, segment in enumerate(found):
+        for cell in segment:
+            by_cell[cell].append(idx)
+    # A cell is part of at most 4 * k segments, however large the board is.
+
+    _SEGMENTS[(n, k)] = (found, by_cell)
+    return _SEGMENTS[(n, k)]
+
+
+class LineCounter(object):
+    """
+    Incremental win detection for N×N boards with k-in-a-row.
+
+    Keeps, per symbol, a count of its marks in every segment of k cells.
+    A move only adds one to the counts of the segments through its cell,
+    the move wins if any of those counts reaches k. The work per move depends on k,
+    not on the size of the board, and nothing is ever rescanned.
+    """
+    def __init__(self, n=3, k=None):
+        """
+        params:
+
+        - n(default=3) int: The number of rows and columns in the board.
+        - k(default=None) int: The number of marks in a row needed to win, defaults to n.
+        """
+        self.n = n
+        self.k = n if k is None else k
+        self.segments, self.segments_by_cell = segments(n, self.k)
+        self.counts = None
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the counts when a new game has to be started.
+        """
+        self.counts = {
+            1: [0] * len(self.segments),
+            2: [0] * len(self.segments),
+        }
+
+    def move(self, item, item_x, item_y):
+        """
+        Count a mark of the symbol with value `item` at (item_x, item_y).
+
+        params:
+
+        - item int: The value of the symbol, 1 for 'O' and 2 for 'X'.
+        - item_x int: The row of the cell.
+        - item_y int: The column of the cell.
+        return: bool, True if this move completed k in a row.
+        """
+        counts = self.counts[item]
+        won = False
+        for segment in self.segments_by_cell[item_x * self.n + item_y]:
+            counts[segment] += 1
+            if counts[segment] == self.k:
+                won = True
+        return won
+
+    def undo(self, item, item_x, item_y):
+        """
+        Take back a mark counted by `move`.
+
+        params:
+
+        - item int: The value of the symbol, 1 for 'O' and 2 for 'X'.
+        - item_x int: The row of the cell.
+        - item_y int: The column of the cell.
+        """
+        counts = self.counts[item]
+        for segment in self.segments_by_cell[item_x * self.n + item_y]:
+            counts[segment] -= 1
@@ -0,0 +1,344 @@
+import math
+import multiprocessing
+import random
+import time
+from bitboard import line_masks
+
+
+class Node(object):
+    """
+    A position in the search tree, reached by `player` plotting a symbol on `cell`.
+
+    `score` counts the playouts through the node from the point of view of `player`:
+    1 for a win, 0.5 for a draw and 0 for a loss.
+    """
+    __slots__ = ('cell', 'player', 'parent', 'children', 'untried', 'visits', 'score', 'winner', 'prior')
+
+    def __init__(self, cell, player, parent, untried, winner=None):
+        self.cell = cell
+        self.player = player
+        self.parent = parent
+        self.children = {}
+        # cell -> Node
+        self.untried = untried
+        # The vacant cells which don't have a child yet.
+        self.visits = 0
+        self.score = 0.0
+        self.winner = winner
+        # None while the game goes on, the value of the winner or 0 for a draw once it's over.
+        self.prior = None
+        # The prior score of each cell for the moves from this node, see `MCTSPlayer.prior_scores`.
+
+
+class MCTSPlayer(object):
+    """
+    A player which searches with Monte Carlo tree search (UCT) at every move, so it needs no
+    training and plays any board size, with the interface of `Agent` used for playing.
+
+    The playouts are random games on bitmasks (see `bitboard.BitBoard`) until a win or a full board.
+    The tree below the chosen move is kept, and if the next board is a position of that subtree
+    (after the opponent's reply), the search goes on from there instead of starting over.
+
+    With `workers`, the playouts run in a pool of processes each growing its own tree from
+    the same position (root parallelization), the visits of the moves are added up.
+    """
+    def __init__(self, sym, n=3, k=None, playouts=1000, time_limit=None, c=1.4,
+                 prior=None, prior_weight=10, workers=0, seed=None):
+        """
+        params:
+
+        - sym str: 'X' or 'O'.
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        - k(default=None) int: The number of symbols in a row needed to win, defaults to n.
+        - playouts(default=1000) int: The most playouts per move, None for no limit.
+        - time_limit(default=None) float: The most seconds per move, None for no limit.
+        - c(default=1.4) float: The exploration constant of UCT.
+        - prior(default=None) Agent: A trained agent of the same board size, new moves start
+                with `prior_weight` playouts scored by the agent's values for them.
+        - prior_weight(default=10) int: How many playouts the prior of a move is worth.
+        - workers(default=0) int: The number of processes to search in, 0 to search in this process.
+        - seed(default=None) int: Seed for the random playouts.
+        """
+        if playouts is None and time_limit is None:
+            raise ValueError('A search needs a playout or a time limit')
+        self.sym = sym
+        self.value = 1 if sym == 'O' else 2
+        self.n = n
+        self.k = k
+        self.cells = n * n
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.c = c
+        self.prior = prior
+        self.prior_weight = prior_weight
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.exploration_rate = 0
+        _, self.lines_by_cell = line_masks(n, k)
+        self.root = None
+        self.root_masks = None
+        # The tree kept from the last search and the masks of 'O' and 'X' at its root.
+        self.pool = None
+
+    def get_serious(self):
+        pass
+
+    def set_state(self, old_board, action, state_key=None, transform=None):
+        pass
+
+    def on_reward(self, reward):
+        pass
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['pool'] = None
+        state['root'] = state['root_masks'] = None
+        # Copies for other processes start with no tree and no pool of their own.
+        return state
+
+    def board_masks(self, board):
+        """
+        Returns the masks of the cells of 'O' and 'X' on the board, indexed by their values: [0, 'O', 'X'].
+        """
+        masks = [0, 0, 0]
+        cell = 0
+        for row in board:
+            for item in row:
+                if item:
+                    masks[int(item)] |= 1 << cell
+                cell += 1
+        return masks
+
+    def is_win(self, mask, cell):
+        for line in self.lines_by_cell[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def new_node(self, cell, player, parent, masks):
+        """
+        Create the node for `player` having played `cell`, `masks` include the move.
+        """
+        if cell is not None and self.is_win(masks[player], cell):
+            return Node(cell, player, parent, [], winner=player)
+        occupied = masks[1] | masks[2]
+        untried = [free for free in range(self.cells) if not occupied >> free & 1]
+        if not untried:
+            return Node(cell, player, parent, untried, winner=0)
+        self.rng.shuffle(untried)
+        # Expand the moves in a random order.
+        node = Node(cell, player, parent, untried)
+        if self.prior is not None and 3 - player == self.value:
+            node.prior = self.prior_scores(masks)
+        return node
+
+    def find_root(self, masks):
+        """
+        Returns the node of the kept tree for the position, or a new root if the position isn't in it.
+        """
+        node = self.root
+        if node is not None:
+            old = self.root_masks
+            if old[1] & ~masks[1] == 0 and old[2] & ~masks[2] == 0:
+                # The kept root is an earlier position of this game.
+                added = [masks[1] & ~old[1], masks[2] & ~old[2]]
+                player = 3 - node.player
+                while node is not None and (added[0] or added[1]):
+                    mask = added[player - 1]
+                    if not mask or mask & (mask - 1):
+                        node = None
+                        # The symbols didn't take turns, it's not a game the tree has seen.
+                        break
+                    node = node.children.get(mask.bit_length() - 1)
+                    added[player - 1] = 0
+                    player = 3 - player
+                if node is not None:
+                    node.parent = None
+                    # Let the rest of the old tree be freed.
+                    return node
+        return self.new_node(None, 3 - self.value, None, masks)
+
+    def prior_scores(self, masks):
+        """
+        The prior score (0 to 1) of each vacant cell from the agent's values, None if it hasn't seen the board.
+        """
+        agent = self.prior
+        board = [[0] * self.n for _ in range(self.n)]
+        for cell in range(self.cells):
+            for item in (1, 2):
+                if masks[item] >> cell & 1:
+                    board[cell // self.n][cell % self.n] = item
+        if agent.symmetry is not None:
+            state_key, transform = agent.symmetry.canonicalize(board)
+        else:
+            state_key, transform = agent.serialize_board(board), None
+        values = agent.states.get(state_key)
+        if values is None:
+            return None
+        if transform is not None:
+            values = agent.symmetry.original_values(transform, values)
+        flat = values.ravel().tolist()
+        return [min(max((value + 1) / 2, 0.0), 1.0) for value in flat]
+        # The values are rewards from -1 to 1.
+
+    def expand(self, node, masks):
+        """
+        Add a child for one of the untried cells of the node and plot it on `masks`.
+        """
+        cell = node.untried.pop()
+        player = 3 - node.player
+        masks[player] |= 1 << cell
+        child = self.new_node(cell, player, node, masks)
+        if node.prior is not None:
+            child.visits = self.prior_weight
+            child.score = self.prior_weight * node.prior[cell]
+            # As if the move had been played out `prior_weight` times already.
+        node.children[cell] = child
+        return child
+
+    def rollout(self, masks, player):
+        """
+        Play random moves until the game ends, `player` moves first.
+
+        return: The value of the winner, 0 for a draw.
+        """
+        occupied = masks[1] | masks[2]
+        cells = [cell for cell in range(self.cells) if not occupied >> cell & 1]
+        self.rng.shuffle(cells)
+        lines_by_cell = self.lines_by_cell
+        for cell in cells:
+            mask = masks[player] | (1 << cell)
+            masks[player] = mask
+            for line in lines_by_cell[cell]:
+                if mask & line == line:
+                    return player
+            player = 3 - player
+        return 0
+
+    def playout(self, root, root_masks):
+        """
+        One iteration of the search: select, expand, play out and back up the result.
+        """
+        node = root
+        masks = list(root_masks)
+        c = self.c
+        while node.winner is None and not node.untried:
+            log_visits = math.log(node.visits)
+            best, best_value = None, -1.0
+            for child in node.children.values():
+                value = child.score / child.visits + c * math.sqrt(log_visits / child.visits)
+                if value > best_value:
+                    best, best_value = child, value
+            node = best
+            masks[node.player] |= 1 << node.cell
+
+        if node.winner is None:
+            node = self.expand(node, masks)
+        winner = node.winner if node.winner is not None else self.rollout(masks, 3 - node.player)
+
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.score += 1.0
+            elif winner == 0:
+                node.score += 0.5
+            node = node.parent
+
+    def search(self, masks, playouts=None, time_limit=None):
+        """
+        Grow the tree from the position within the budget.
+
+        params:
+
+        - masks list(int): The masks of the position, see `board_masks`.
+        - playouts(default=None) int: The most playouts, `self.playouts` if None.
+        - time_limit(default=None) float: The most seconds, `self.time_limit` if None.
+        return: dict of cell -> (visits, score) added to the moves at the root by this search.
+        """
+        playouts = self.playouts if playouts is None else playouts
+        time_limit = self.time_limit if time_limit is None else time_limit
+        root = self.find_root(masks)
+        root_masks = list(masks)
+        before = {cell: (child.visits, child.score) for cell, child in root.children.items()}
+
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        done = 0
+        while root.winner is None:
+            self.playout(root, root_masks)
+            done += 1
+            if playouts is not None and done >= playouts:
+                break
+            if deadline is not None and done % 16 == 0 and time.perf_counter() >= deadline:
+                break
+
+        self.root, self.root_masks = root, root_masks
+        return {
+            cell: (child.visits - before.get(cell, (0, 0.0))[0], child.score - before.get(cell, (0, 0.0))[1])
+            for cell, child in root.children.items()
+        }
+
+    def select_move(self, board, state_key=None):
+        """
+        Returns the cell (row, column) with the most visits after searching the board.
+        """
+        masks = self.board_masks(board)
+        if self.workers:
+            stats = self.parallel_search(masks)
+        else:
+            self.search(masks)
+            stats = {cell: (child.visits, child.score) for cell, child in self.root.children.items()}
+            # Count the visits from earlier searches of the kept tree too.
+        if not stats:
+            raise ValueError('There is no move to make on a finished game')
+        cell = max(stats, key=lambda move: (stats[move][0], stats[move][1]))
+        if not self.workers:
+            self.root = self.root.children[cell]
+            self.root.parent = None
+            masks = list(self.root_masks)
+            masks[self.value] |= 1 << cell
+            self.root_masks = masks
+            # Keep the subtree of the move for the next search.
+        return divmod(cell, self.n)
+
+    def policy(self, board):
+        """
+        Same as `select_move`, for serving (see `server.GameServer`).
+        """
+        return self.select_move(board)
+
+    def parallel_search(self, masks):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(self,))
+        playouts = None if self.playouts is None else -(-self.playouts // self.workers)
+        jobs = [(masks, playouts, self.rng.randrange(2 ** 31)) for _ in range(self.workers)]
+        stats = {}
+        for result in self.pool.map(_search, jobs):
+            for cell, (visits, score) in result.items():
+                total = stats.get(cell, (0, 0.0))
+                stats[cell] = (total[0] + visits, total[1] + score)
+        return stats
+
+    def close(self):
+        """
+        Stop the worker processes, if any.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+_PLAYER = None
+# The copy of the player searching in a worker process, it keeps its tree between moves.
+
+
+def _init_worker(player):
+    global _PLAYER
+    _PLAYER = player
+    _PLAYER.workers = 0
+
+
+def _search(job):
+    masks, playouts, seed = job
+    _PLAYER.rng.seed(seed)
+    return _PLAYER.search(masks, playouts=playouts)
@@ -0,0 +1,101 @@
+import time
+from collections import defaultdict
+
+
+class Metrics(object):
+    """
+    Counters and timers for the training loop.
+
+    Disabled by default, the hot paths check `metrics.enabled` before recording anything,
+    so a disabled instance costs one attribute lookup per call site.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(lambda: [0, 0.0])
+        # name -> [number of calls, total seconds]
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def count(self, name, value=1):
+        """
+        Add `value` to the counter `name`.
+        """
+        self.counters[name] += value
+
+    def add_time(self, name, seconds):
+        """
+        Record a call of `name` that took `seconds`.
+        """
+        timer = self.timers[name]
+        timer[0] += 1
+        timer[1] += seconds
+
+    def snapshot(self):
+        """
+        Returns the counters and the timers (calls, total and mean seconds) as a dict.
+        """
+        return {
+            'counters': dict(self.counters),
+            'timers': {
+                name: {'calls': calls, 'total_s': total, 'mean_s': total / calls if calls else 0.0}
+                for name, (calls, total) in self.timers.items()
+            },
+        }
+
+
+metrics = Metrics()
+# The instance shared by the board, the agents and the training loop.
+
+
+class Timer(object):
+    """
+    Times a block into `metrics`, only when they are enabled:
+
+        with Timer('on_reward'):
+            ...
+    """
+    def __init__(self, name, registry=metrics):
+        self.name = name
+        self.registry = registry
+        self.start = None
+
+    def __enter__(self):
+        if self.registry.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        if self.start is not None:
+            self.registry.add_time(self.name, time.perf_counter() - self.start)
+            self.start = None
+
+
+class Profile(object):
+    """
+    Run a profiler only inside the block, for profilers with enable/disable (cProfile)
+    or start/stop (most sampling profilers).
+    """
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def __enter__(self):
+        if hasattr(self.profiler, 'enable'):
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+        return self.profiler
+
+    def __exit__(self, *args):
+        if hasattr(self.profiler, 'disable'):
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
@@ -0,0 +1,127 @@
+import multiprocessing
+import numpy as np
+from train import train
+from utils import log
+
+
+def table_delta(table, keys, values):
+    """
+    Find how much each state of a table moved away from an earlier export of it.
+
+    params:
+
+    - table: The `qtable.QTable` after training.
+    - keys list(int), values: The `export` of the same table before training.
+    return: tuple(list(int), array), the states that changed and the change in their values.
+    """
+    before = dict(zip(keys, values))
+    after_keys, after_values = table.export()
+    zeroes = np.zeros(table.cells, dtype=after_values.dtype)
+    deltas = after_values - np.array([before.get(key, zeroes) for key in after_keys]).reshape(after_values.shape)
+    changed = deltas.any(axis=1)
+    return [key for key, keep in zip(after_keys, changed) if keep], deltas[changed]
+
+
+def self_play(job):
+    """
+    Runs in a worker process: play `epochs` games between the copies of the agents
+    and send back the changes in their tables instead of the whole tables.
+
+    params:
+
+    - job tuple: (bot1, bot2, epochs, seed, k)
+    return: tuple(delta of bot1, delta of bot2, exploration rates, wins)
+    """
+    bot1, bot2, epochs, seed, k = job
+    np.random.seed(seed)
+    exports = [
+        None if bot.states.shared else bot.states.export()
+        for bot in (bot1, bot2)
+    ]
+    # Shared tables are updated in place, there is nothing to send back for them.
+    wins = train(epochs, bot1, bot2, k=k)
+    deltas = [
+        ([], np.zeros((0, bot.states.cells), dtype=np.float32))
+        if export is None
+        else table_delta(bot.states, *export)
+        for bot, export in zip((bot1, bot2), exports)
+    ]
+    return deltas, (bot1.exploration_rate, bot2.exploration_rate), wins
+
+
+def merge(bot, deltas, exploration_rates, mean=True):
+    """
+    Apply the changes learned by the workers to the master copy of an agent.
+
+    params:
+
+    - bot Agent: The master copy of the agent.
+    - deltas list: The (keys, values) changes from each worker.
+    - exploration_rates list(float): The exploration rate of each worker's copy after training.
+    - mean(default=True) bool: Average the changes over the workers if True, sum them otherwise.
+    """
+    scale = 1.0 / len(deltas) if mean else 1.0
+    for keys, values in deltas:
+        bot.states.add(keys, values * scale)
+    if bot.cache is not None:
+        bot.cache.clear()
+
+    start = bot.exploration_rate
+    decayed = sum(start - rate for rate in exploration_rates)
+    bot.exploration_rate = max(start - decayed, min(exploration_rates))
+    # The workers' games count as if they were played one after another,
+    # but never decay below where the workers stopped (`Agent.min_exploration_rate`).
+
+
+def parallel_train(epochs, bot1, bot2, workers=None, sync_interval=100, mean=True, seed=None, k=None):
+    """
+    Self-play training over a pool of worker processes.
+
+    Every round, each worker gets a copy of the two agents and plays `sync_interval` games,
+    the changes to their tables are then merged into `bot1` and `bot2`
+    and the next round starts from the merged tables.
+    Agents with a `qtable.SharedQTable` learn into the one shared table directly and skip the merge.
+
+    params:
+
+    - epochs int: The total number of games to play.
+    - bot1, bot2 Agent: The agents to train, updated in place.
+    - workers(default=None) int: The number of processes, defaults to the number of CPUs.
+    - sync_interval(default=100) int: The number of games each worker plays between merges.
+    - mean(default=True) bool: Average the changes of the workers if True, sum them otherwise.
+    - seed(default=None) int: Seed for the workers' random number generators.
+    - k(default=None) int: The number of symbols in a row needed to win, defaults to the board size.
+    return: tuple(int, int), the wins of bot1 and bot2, same as `train.train`.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    rng = np.random.RandomState(seed)
+    wins = [0, 0]
+    played = 0
+
+    with multiprocessing.Pool(workers) as pool:
+        while played < epochs:
+            games = [
+                min(sync_interval, max(epochs - played - i * sync_interval, 0))
+                for i in range(workers)
+            ]
+            jobs = [
+                (bot1, bot2, count, rng.randint(2 ** 31), k)
+                for count in games
+                if count
+            ]
+            results = pool.map(self_play, jobs)
+
+            for idx, bot in enumerate((bot1, bot2)):
+                merge(
+                    bot,
+                    [deltas[idx] for deltas, _, _ in results],
+                    [rates[idx] for _, rates, _ in results],
+                    mean=mean
+                )
+            for _, _, (wins1, wins2) in results:
+                wins[0] += wins1
+                wins[1] += wins2
+
+            played += sum(games)
+            log('parallel training: {}/{} games'.format(played, epochs))
+    return wins[0], wins[1]
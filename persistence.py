@@ -0,0 +1,174 @@
+import os
+import struct
+import numpy as np
+from agent import Agent
+from qtable import QTable, make_qtable
+
+
+MAGIC = b'TTTQ'
+VERSION = 1
+HEADER = struct.Struct('<4sHHcB4dQ')
+# magic, version, n, symbol, symmetry flag,
+# exploration_rate, decay, learning_rate, discount_factor,
+# number of states.
+HEADER_SIZE = 64
+# The header is padded so that the arrays after it are aligned.
+#
+# File layout:
+#
+#     +--------------------------------+
+#     | header, padded to 64 bytes     |
+#     +--------------------------------+
+#     | keys: uint64[states], sorted   |
+#     +--------------------------------+
+#     | values: float32[states, N*N]   |
+#     +--------------------------------+
+#
+# The values of the i-th key are in the i-th row of values.
+
+
+class MappedQTable(QTable):
+    """
+    A read-only Q-table over the arrays of a saved agent.
+
+    The keys are sorted, so a state is found with a binary search,
+    nothing is read from the file until a state is looked up.
+    """
+    def __init__(self, n, keys, values):
+        """
+        params:
+
+        - n int: The number of rows and columns in the tic-tac-toe board.
+        - keys: The sorted array of state codes.
+        - values: The array of shape (states, N*N), row i has the values of keys[i].
+        """
+        super(MappedQTable, self).__init__(n)
+        self.index = keys
+        self.values = values
+
+    def row(self, key):
+        row = int(np.searchsorted(self.index, key))
+        if row < len(self.index) and self.index[row] == key:
+            return row
+        return -1
+
+    def rows(self, keys):
+        keys = np.asarray(keys, dtype=self.index.dtype)
+        if not len(self.index):
+            return np.full(len(keys), -1, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.index, keys), len(self.index) - 1)
+        return np.where(self.index[rows] == keys, rows, -1).astype(np.int64)
+
+    def add_row(self, key):
+        raise ValueError('A memory-mapped table is read-only, load it with mmap=False to keep training')
+        # Even for the states it has, `__setitem__` and `add` write into the row they get.
+
+    def add_rows(self, keys):
+        raise ValueError('A memory-mapped table is read-only, load it with mmap=False to keep training')
+        # `backup.backup_episodes` asks for the rows of every update, learning stops here.
+
+    def keys(self):
+        return self.index.tolist()
+
+    def __len__(self):
+        return len(self.index)
+
+
+def snapshot(agent):
+    """
+    Copy what `save_agent` writes out of an agent, so that the agent can go on
+    learning while the copy is written, e.g. by a background thread.
+
+    return: tuple(header bytes, sorted keys, values in the order of the keys)
+    """
+    if 3 ** (agent.n * agent.n) > 2 ** 64:
+        raise ValueError('Codes of a {0}x{0} board do not fit in the file format'.format(agent.n))
+
+    keys, values = agent.states.export()
+    keys = np.array(keys, dtype=np.uint64)
+    order = np.argsort(keys)
+    header = HEADER.pack(
+        MAGIC, VERSION, agent.n, agent.sym.encode(), agent.symmetry is not None,
+        agent.exploration_rate, agent.decay, agent.learning_rate, agent.discount_factor,
+        len(keys)
+    )
+    return header, keys[order], np.ascontiguousarray(values[order], dtype=np.float32)
+
+
+def write_snapshot(copy, path):
+    """
+    Write the output of `snapshot` to `path`.
+
+    The file is written next to `path` first and then moved over it,
+    so a reader never sees a half written file.
+    """
+    header, keys, values = copy
+    temp_path = '{}.tmp'.format(path)
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.write(keys.tobytes())
+        f.write(values.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+        # Make sure the data is on disk before the rename can be.
+    os.replace(temp_path, path)
+
+
+def save_agent(agent, path):
+    """
+    Write the table and the hyperparameters of an agent to `path`, atomically (see `write_snapshot`).
+
+    params:
+
+    - agent Agent: The agent to save.
+    - path str: The file to write.
+    """
+    write_snapshot(snapshot(agent), path)
+
+
+def load_agent(path, mmap=True):
+    """
+    Create an agent from a file written by `save_agent`.
+
+    params:
+
+    - path str: The file to read.
+    - mmap(default=True) bool: If True, the table is memory-mapped (read-only) so loading takes
+            constant time and the pages are shared by every process which loads the same file.
+            If False, the table is copied into a regular table which can keep learning.
+    return: Agent
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    magic, version, n, sym, symmetry, exploration_rate, decay, learning_rate, discount_factor, count = \
+        HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError('{} is not a saved agent'.format(path))
+    if version != VERSION:
+        raise ValueError('{} has format version {}, expected {}'.format(path, version, VERSION))
+
+    cells = n * n
+    if count:
+        keys = np.memmap(path, dtype=np.uint64, mode='r', offset=HEADER_SIZE, shape=(count,))
+        values = np.memmap(path, dtype=np.float32, mode='r', offset=HEADER_SIZE + keys.nbytes, shape=(count, cells))
+    else:
+        # numpy can't map an empty array.
+        keys = np.zeros(0, dtype=np.uint64)
+        values = np.zeros((0, cells), dtype=np.float32)
+
+    if mmap:
+        states = MappedQTable(n, keys, values)
+    else:
+        states = make_qtable(n)
+        states.add(keys.tolist(), values)
+
+    return Agent(
+        sym.decode(),
+        exploration_rate=exploration_rate,
+        decay=decay,
+        learning_rate=learning_rate,
+        discount_factor=discount_factor,
+        n=n,
+        states=states,
+        symmetry=bool(symmetry)
+    )
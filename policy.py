@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def masked_argmax(values, free, rng=np.random):
+    """
+    Find the vacant cell with the highest value, ties are broken at random.
+
+    params:
+
+    - values: An NxN matrix of action values.
+    - free: An NxN boolean matrix, True where the cell is vacant.
+    - rng(default=np.random): A numpy random generator or the np.random module.
+    return: tuple(int, int), the row and column of the chosen cell.
+    """
+    n = len(values)
+    masked = np.where(np.ravel(free), np.ravel(values), -np.inf)
+    # Occupied cells can never be the maximum.
+
+    best = np.flatnonzero(masked == masked.max())
+    cell = best[0] if len(best) == 1 else best[int(rng.random() * len(best))]
+    return divmod(int(cell), n)
+
+
+def batch_masked_argmax(values, free, rng=np.random):
+    """
+    `masked_argmax` for many boards at once.
+
+    params:
+
+    - values: An array of shape (boards, N*N) of action values.
+    - free: A boolean array of shape (boards, N*N), True where the cell is vacant.
+    - rng(default=np.random): A numpy random generator or the np.random module.
+    return: An array of the chosen cell index (row * N + column) per board.
+    """
+    masked = np.where(free, values, -np.inf)
+    best = masked == masked.max(axis=1, keepdims=True)
+    scores = np.where(best, rng.random(masked.shape), -1.0)
+    # A random score for each of the best cells picks one of them uniformly.
+    return scores.argmax(axis=1)
@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+
+ENTRY_BYTES = 160
+# An estimate of the memory held by one entry: the slot in the ordered dict,
+# its linked list node, the int key and the cached cell.
+
+
+class PolicyCache(object):
+    """
+    A bounded cache of the best move per state, evicting the least recently used state when full.
+
+    It saves the table lookup and the argmax for positions that come up again and again,
+    the openings and common middle games, which matters when the table is a large
+    `qtable.HashQTable` or a memory-mapped one rather than a dense array.
+
+    The code of a state already tells which cells are vacant, so it is the whole key.
+    An entry must be dropped with `invalidate` whenever the values of its state change,
+    `Agent.on_reward` does that for the states it updates. Other processes writing to a
+    `qtable.SharedQTable` don't, so an agent with a shared table refuses a cache.
+    """
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        """
+        params:
+
+        - max_bytes(default=16MB) int: The memory budget, the cache holds `max_bytes // ENTRY_BYTES` states.
+        """
+        self.capacity = max(1, max_bytes // ENTRY_BYTES)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Agents serving games from a thread pool share one cache.
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns the cached cell for the state, None if it isn't cached.
+        """
+        with self.lock:
+            cell = self.entries.get(key)
+            if cell is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return cell
+
+    def put(self, key, cell):
+        """
+        Cache the best cell (row * N + column) for the state.
+        """
+        with self.lock:
+            self.entries[key] = cell
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys):
+        """
+        Drop the entries of states whose values have changed.
+        """
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        # Locks can't be pickled, copies of an agent sent to worker processes get a new one.
+
+    def stats(self):
+        """
+        Returns the hits, misses, evictions, hit rate and size of the cache as a dict.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'capacity': self.capacity,
+            'bytes': len(self.entries) * ENTRY_BYTES,
+        }
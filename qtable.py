@@ -0,0 +1,312 @@
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+
+DEFAULT_MAX_DENSE_BYTES = 64 * 1024 * 1024
+# A dense table for 3x3 boards takes 3^9 * 9 * 4 bytes (~700KB), 4x4 would need ~2.7GB
+# so anything above this budget gets a hash table instead.
+
+
+class QTable(object):
+    """
+    A table of state-action values, a drop-in replacement for the dict of NxN matrices
+    used as `Agent.states`.
+
+    All the values live in one contiguous float32 matrix `values`, with a row of N*N
+    action values per state. Subclasses decide how a state code maps to a row.
+
+    Indexing a state returns an NxN view of its row, so
+
+        table[state_key][action] = reward
+
+    updates the table in place, just like it did for the dict of matrices.
+    """
+    shared = False
+    # True if other processes see the updates to this table without merging.
+
+    def __init__(self, n=3):
+        """
+        params:
+
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        """
+        self.n = n
+        self.cells = n * n
+        self.values = None
+
+    def row(self, key):
+        """
+        Returns the row of `values` for the state, -1 if the state is not in the table.
+        """
+        raise NotImplementedError
+
+    def add_row(self, key):
+        """
+        Returns the row of `values` for the state, adding a zeroed row if the state is new.
+        """
+        raise NotImplementedError
+
+    def keys(self):
+        """
+        Returns the codes of the states in the table.
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        return self.row(key) >= 0
+
+    def contains(self, keys):
+        """
+        Returns a boolean array, True for each of the `keys` which is in the table.
+        """
+        return np.array([self.row(key) >= 0 for key in keys], dtype=bool)
+
+    def rows(self, keys):
+        """
+        `row` for many states, returns an array of their rows, -1 for the states not in the table.
+        """
+        return np.array([self.row(key) for key in keys], dtype=np.int64)
+
+    def add_rows(self, keys):
+        """
+        `add_row` for many states, returns an array of their rows.
+        """
+        return np.array([self.add_row(key) for key in keys], dtype=np.int64)
+
+    def __getitem__(self, key):
+        row = self.row(key)
+        if row < 0:
+            raise KeyError(key)
+        return self.values[row].reshape(self.n, self.n)
+
+    def __setitem__(self, key, value):
+        row = self.add_row(key)
+        # Find the row first, adding it may reallocate `values`.
+        self.values[row] = np.ravel(value)
+
+    def get(self, key, default=None):
+        row = self.row(key)
+        if row < 0:
+            return default
+        return self.values[row].reshape(self.n, self.n)
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def export(self):
+        """
+        Returns the codes of the states in the table and a copy of their rows.
+
+        return: tuple(list(int), array of shape (states, N*N))
+        """
+        keys = self.keys()
+        return keys, self.values[[self.row(key) for key in keys]]
+
+    def add(self, keys, values):
+        """
+        Add rows of values to the states in `keys`, the states that are new start from zeroes.
+
+        params:
+
+        - keys list(int): The codes of the states.
+        - values: An array of shape (len(keys), N*N).
+        """
+        for key, row_values in zip(keys, values):
+            row = self.add_row(key)
+            self.values[row] += row_values
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes used by the values.
+        """
+        return self.values.nbytes
+
+
+class DenseQTable(QTable):
+    """
+    A Q-table with a preallocated row for every possible board, the row of a state is its code.
+
+    Only practical when 3^(N*N) rows fit in memory, i.e. for 3x3 boards.
+    """
+    def __init__(self, n=3):
+        super(DenseQTable, self).__init__(n)
+        size = 3 ** self.cells
+        self.values = np.zeros((size, self.cells), dtype=np.float32)
+        self.visited = np.zeros(size, dtype=bool)
+        # Tells apart the states that were learned from the ones that are just zeroes.
+
+    def row(self, key):
+        return key if self.visited[key] else -1
+
+    def add_row(self, key):
+        self.visited[key] = True
+        return key
+
+    def contains(self, keys):
+        return self.visited[np.asarray(keys, dtype=np.int64)]
+
+    def rows(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        return np.where(self.visited[keys], keys, -1)
+
+    def add_rows(self, keys):
+        rows = np.asarray(keys, dtype=np.int64)
+        self.visited[rows] = True
+        return rows
+
+    def keys(self):
+        return np.flatnonzero(self.visited).tolist()
+
+    def __len__(self):
+        return int(np.count_nonzero(self.visited))
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.visited.nbytes
+
+
+class SharedQTable(DenseQTable):
+    """
+    A dense Q-table in shared memory, one table per host for any number of processes.
+
+    The table created by one process can be passed to others, by pickling it through
+    `multiprocessing` or by its `name`, and they attach to the same memory instead of copying it.
+    Updates are written straight into the shared memory with no locks: every process reads
+    the latest values, and two processes updating the same state at the same time can lose
+    one of the two updates, which is no worse than the staleness of merging copies.
+    """
+    shared = True
+
+    def __init__(self, n=3, name=None):
+        """
+        params:
+
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        - name(default=None) str: The name of an existing table to attach to, a new table is created if None.
+        """
+        QTable.__init__(self, n)
+        size = 3 ** self.cells
+        values_size = size * self.cells * np.dtype(np.float32).itemsize
+        if name is None:
+            self.memory = create_shared_memory(values_size + size)
+            # New shared memory is zero filled, so the table starts empty.
+        else:
+            self.memory = attach_shared_memory(name)
+        self.owner = name is None
+        self.values = np.ndarray((size, self.cells), dtype=np.float32, buffer=self.memory.buf)
+        self.visited = np.ndarray((size,), dtype=bool, buffer=self.memory.buf, offset=values_size)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def __reduce__(self):
+        return SharedQTable, (self.n, self.name)
+        # Pickle the name only, the receiving process attaches to the same memory.
+
+    def close(self):
+        """
+        Detach this process from the table, call `unlink` as well from the process that created it.
+        """
+        self.values = self.visited = None
+        self.memory.close()
+
+    def unlink(self):
+        """
+        Free the shared memory once every process is done with it.
+        """
+        self.memory.unlink()
+
+
+_CREATED = set()
+# The names of the shared memory created by this process, its resource tracker frees them.
+
+
+def create_shared_memory(size):
+    """
+    Create shared memory of `size` bytes, freed by this process' resource tracker if it isn't unlinked.
+    """
+    memory = shared_memory.SharedMemory(create=True, size=size)
+    _CREATED.add(memory.name)
+    return memory
+
+
+def attach_shared_memory(name):
+    """
+    Attach to existing shared memory without registering it with this process' resource tracker,
+    otherwise a process exiting would free the memory still used by the others.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+        # python < 3.13 has no `track` and always registers the memory.
+        if multiprocessing.parent_process() is None and name not in _CREATED:
+            resource_tracker.unregister(memory._name, 'shared_memory')
+            # Take it back in a process with a tracker of its own. Workers started by `multiprocessing`
+            # share the tracker of the process that created the memory, where it must stay registered.
+        return memory
+
+
+class HashQTable(QTable):
+    """
+    A Q-table for boards whose state space is too large to preallocate.
+
+    A dict maps the state codes to rows of `values`, which grows by doubling as new states are added.
+    """
+    def __init__(self, n=3, capacity=1024):
+        """
+        params:
+
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        - capacity(default=1024) int: The number of rows to allocate up front.
+        """
+        super(HashQTable, self).__init__(n)
+        self.index = {}
+        self.values = np.zeros((capacity, self.cells), dtype=np.float32)
+
+    def row(self, key):
+        return self.index.get(key, -1)
+
+    def add_row(self, key):
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.index)
+            if row == len(self.values):
+                self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+            self.index[key] = row
+        return row
+
+    def keys(self):
+        return list(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def nbytes(self):
+        return self.values[:len(self.index)].nbytes
+
+
+def make_qtable(n=3, max_dense_bytes=DEFAULT_MAX_DENSE_BYTES):
+    """
+    Returns a dense table if all the states of an NxN board fit in `max_dense_bytes`,
+    otherwise a hash table.
+
+    params:
+
+    - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+    - max_dense_bytes(default=64MB) int: The memory budget for a dense table.
+    """
+    cells = n * n
+    if 3 ** cells * cells * np.dtype(np.float32).itemsize <= max_dense_bytes:
+        return DenseQTable(n)
+    return HashQTable(n)
@@ -0,0 +1,226 @@
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from bitboard import BitBoard
+from inference import MicroBatcher
+
+
+MARKS = {0: '.', 1: 'O', 2: 'X'}
+VALUES = {'O': 1, 'X': 2}
+
+# The protocol is line based, one response line per command:
+#
+#   NEW         -> start a game against the bot, the bot plays first if its symbol is 'X'.
+#   MOVE r c    -> plot the player's symbol at row r, column c, the bot replies with its move.
+#   QUIT        -> close the connection.
+#
+# Responses:
+#
+#   STATE <cells> <status> <bot move>
+#       cells: The board row by row, '.' for vacant cells, e.g. 'X...O....'
+#       status: 'play', 'win:X', 'win:O' or 'draw'
+#       bot move: 'r,c' of the bot's move in reply, '-' if it didn't move.
+#   ERROR <message>
+
+
+class Session(object):
+    """
+    The state of one game, two integer masks and the symbols, so that a server can hold many of them.
+    """
+    __slots__ = ('engine', 'player', 'bot', 'status')
+
+    def __init__(self, n, bot_sym):
+        self.engine = BitBoard(n)
+        self.bot = VALUES[bot_sym]
+        self.player = 3 - self.bot
+        self.status = 'play'
+
+    def cells(self):
+        return ''.join(MARKS[item] for row in self.engine.rows() for item in row)
+
+    def move(self, item, item_x, item_y):
+        """
+        Plot a symbol and update the status of the game.
+        """
+        if self.engine.move(item, item_x, item_y):
+            self.status = 'win:{}'.format(MARKS[item])
+        elif self.engine.is_full():
+            self.status = 'draw'
+
+    def response(self, bot_move=None):
+        return 'STATE {} {} {}'.format(
+            self.cells(),
+            self.status,
+            '{},{}'.format(*bot_move) if bot_move else '-'
+        )
+
+
+class GameServer(object):
+    """
+    Hosts games of human players against one trained agent over TCP.
+
+    The agent is shared by every session and only used through `Agent.policy`, which doesn't
+    change it, so it is safe to serve from a memory-mapped table (see `persistence.load_agent`).
+    Moves are computed on a thread pool, the event loop only handles the connections.
+    """
+    def __init__(self, agent, workers=4, batch_window=None, max_batch=256):
+        """
+        params:
+
+        - agent Agent: The trained agent to play against.
+        - workers(default=4) int: The number of threads computing the bot's moves.
+        - batch_window(default=None) float: Seconds to collect the moves of concurrent sessions
+                for a `inference.MicroBatcher`, None to compute every move on its own.
+        - max_batch(default=256) int: The largest batch of moves computed at once.
+        """
+        self.agent = agent
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.batcher = None
+        if batch_window is not None:
+            self.batcher = MicroBatcher(agent, window=batch_window, max_batch=max_batch, executor=self.executor)
+        self.sessions = 0
+        # The number of open connections.
+
+    async def bot_move(self, session):
+        board = np.array(session.engine.rows())
+        if self.batcher is not None:
+            move = await self.batcher.policy(board)
+        else:
+            move = await asyncio.get_running_loop().run_in_executor(self.executor, self.agent.policy, board)
+        session.move(session.bot, *move)
+        return move
+
+    async def command(self, session, line):
+        """
+        Run one command of the protocol.
+
+        return: tuple(the session, the response line)
+        """
+        parts = line.split()
+        if not parts:
+            return session, 'ERROR empty command'
+        name = parts[0].upper()
+
+        if name == 'NEW':
+            session = Session(self.agent.n, self.agent.sym)
+            move = await self.bot_move(session) if session.bot == VALUES['X'] else None
+            return session, session.response(move)
+
+        if name == 'MOVE':
+            if session is None:
+                return session, 'ERROR no game, send NEW first'
+            if session.status != 'play':
+                return session, 'ERROR game over, send NEW to play again'
+            try:
+                item_x, item_y = int(parts[1]), int(parts[2])
+            except (IndexError, ValueError):
+                return session, 'ERROR usage: MOVE <row> <column>'
+            n = session.engine.n
+            if not (0 <= item_x < n and 0 <= item_y < n) or not session.engine.is_free(item_x, item_y):
+                return session, 'ERROR illegal move'
+            session.move(session.player, item_x, item_y)
+            move = await self.bot_move(session) if session.status == 'play' else None
+            return session, session.response(move)
+
+        return session, 'ERROR unknown command {}'.format(name)
+
+    async def handle(self, reader, writer):
+        self.sessions += 1
+        session = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode().strip()
+                if line.upper() == 'QUIT':
+                    break
+                session, response = await self.command(session, line)
+                writer.write((response + '\n').encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765):
+        return await asyncio.start_server(self.handle, host, port)
+
+
+class Client(object):
+    """
+    A minimal client for the protocol, for tests and load generation:
+
+        client = await Client.connect('127.0.0.1', 8765)
+        print(await client.send('NEW'))
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def send(self, line):
+        self.writer.write((line + '\n').encode())
+        await self.writer.drain()
+        return (await self.reader.readline()).decode().strip()
+
+    async def close(self):
+        self.writer.write(b'QUIT\n')
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def add_arguments(parser):
+    """
+    The options of `run`, shared with the `cli.py` entry point.
+    """
+    parser.add_argument('--agent', help='a file saved by persistence.save_agent')
+    parser.add_argument('--epochs', type=int, default=10000,
+                        help='games of self-play to train an agent with when no file is given')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-window', type=float, default=None,
+                        help='seconds to collect concurrent move requests into one batch')
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--cache-mb', type=float, default=None,
+                        help='memory budget of an LRU cache of the best move per state')
+
+
+def run(args):
+    if args.agent:
+        from persistence import load_agent
+        agent = load_agent(args.agent)
+    else:
+        from agent import Agent
+        from train import train
+        agent = Agent(sym='X')
+        train(args.epochs, agent, Agent(sym='O'))
+    if args.cache_mb:
+        from policy_cache import PolicyCache
+        agent.cache = PolicyCache(max_bytes=int(args.cache_mb * 1024 * 1024))
+
+    async def serve():
+        server = await GameServer(
+            agent, workers=args.workers, batch_window=args.batch_window, max_batch=args.max_batch
+        ).start(args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve games against a trained agent.')
+    add_arguments(parser)
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+from bitboard import line_masks
+from encoding import cell_weights, encode_board
+
+
+EXACT, LOWER, UPPER = 0, 1, 2
+# The kind of value stored in the transposition table:
+# the exact value of the position, or a lower/upper bound found when the search was cut off.
+
+
+class Solver(object):
+    """
+    Solves tic-tac-toe exactly with negamax, alpha-beta pruning and a transposition table.
+
+    Positions are identified by the code of the board (see `encoding.encode_board`),
+    'X' (value 2) moves first, so the symbol to move follows from the number of marks on the board.
+
+    The value of a position is from the point of view of the symbol to move:
+        - 0 if the best play on both sides is a draw.
+        - positive if it wins, 1 + the number of vacant cells left after the winning move,
+            so a quicker win is worth more.
+        - negative if it loses, by the same measure.
+    """
+    def __init__(self, n=3):
+        """
+        params:
+
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+                Only 3x3 is small enough to solve in a reasonable time.
+        """
+        self.n = n
+        self.cells = n * n
+        self.full_mask = (1 << self.cells) - 1
+        _, self.lines_by_cell = line_masks(n)
+        self.weights = cell_weights(n)
+        self.transpositions = {}
+        # code -> (value, kind of value, best cell)
+
+    def is_win(self, mask, cell):
+        for line in self.lines_by_cell[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def search(self, mine, theirs, item, code, alpha, beta):
+        """
+        Negamax search of the position where the symbol with value `item` is to move.
+
+        params:
+
+        - mine int: The mask of the cells of the symbol to move.
+        - theirs int: The mask of the cells of the other symbol.
+        - item int: The value of the symbol to move, 1 for 'O' and 2 for 'X'.
+        - code int: The code of the board.
+        - alpha, beta: The window of values that matter to the caller.
+        return: The value of the position, exact if it is within (alpha, beta), a bound otherwise.
+        """
+        entry = self.transpositions.get(code)
+        best_cell = None
+        if entry is not None:
+            value, kind, best_cell = entry
+            if kind == EXACT \
+                    or (kind == LOWER and value >= beta) \
+                    or (kind == UPPER and value <= alpha):
+                return value
+
+        occupied = mine | theirs
+        vacant = self.cells - bin(occupied).count('1') - 1
+        # The number of vacant cells after this move.
+
+        cells = [cell for cell in range(self.cells) if not occupied & (1 << cell)]
+        if best_cell is not None:
+            cells.remove(best_cell)
+            cells.insert(0, best_cell)
+            # The best move from an earlier search is the most likely to cause a cut off.
+
+        start_alpha = alpha
+        best_value = None
+        for cell in cells:
+            mask = mine | (1 << cell)
+            if self.is_win(mask, cell):
+                value = vacant + 1
+            elif vacant == 0:
+                value = 0
+            else:
+                value = -self.search(
+                    theirs, mask, 3 - item,
+                    code + item * self.weights[cell],
+                    -beta, -alpha
+                )
+            if best_value is None or value > best_value:
+                best_value, best_cell = value, cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        kind = UPPER if best_value <= start_alpha else LOWER if best_value >= beta else EXACT
+        self.transpositions[code] = (best_value, kind, best_cell)
+        return best_value
+
+    def solve_position(self, mine, theirs, item, code):
+        """
+        Returns the exact value and the best cell (as row, column) of a position.
+        """
+        inf = self.cells + 2
+        value = self.search(mine, theirs, item, code, -inf, inf)
+        _, _, cell = self.transpositions[code]
+        return value, divmod(cell, self.n)
+
+    def solve(self):
+        """
+        Solve every position that can be reached from the empty board.
+
+        return: dict mapping the code of each position where the game is not over yet
+                to (best row, best column, value).
+        """
+        table = {}
+        stack = [(0, 0, 2, 0)]
+        # (mask of the symbol to move, mask of the other symbol, value of the symbol to move, code)
+
+        while stack:
+            mine, theirs, item, code = stack.pop()
+            if code in table:
+                continue
+            value, (item_x, item_y) = self.solve_position(mine, theirs, item, code)
+            table[code] = (item_x, item_y, value)
+
+            occupied = mine | theirs
+            for cell in range(self.cells):
+                if occupied & (1 << cell):
+                    continue
+                mask = mine | (1 << cell)
+                if self.is_win(mask, cell) or mask | theirs == self.full_mask:
+                    continue
+                stack.append((theirs, mask, 3 - item, code + item * self.weights[cell]))
+        return table
+
+
+class SolvedAgent(object):
+    """
+    A perfect player with the same interface as `Agent`, every move is a lookup
+    into the table from `Solver.solve`.
+
+    It never learns, `on_reward` and `set_state` do nothing,
+    which makes it a fixed opponent and a reference for judging learned agents.
+    """
+    def __init__(self, sym, n=3, table=None):
+        """
+        params:
+
+        - sym str: 'X' or 'O'.
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        - table(default=None) dict: The output of `Solver.solve`, solved on creation if not given.
+        """
+        self.sym = sym
+        self.value = 1 if sym == 'O' else 2
+        self.n = n
+        self.table = Solver(n).solve() if table is None else table
+        self.exploration_rate = 0
+
+    def get_serious(self):
+        pass
+
+    def set_state(self, old_board, action, state_key=None, transform=None):
+        pass
+
+    def on_reward(self, reward):
+        pass
+
+    def position_value(self, board, state_key=None):
+        """
+        The value of the board for the symbol to move, see `Solver`.
+        """
+        if state_key is None:
+            state_key = encode_board(board)
+        return self.table[state_key][2]
+
+    def select_move(self, board, state_key=None):
+        """
+        Returns the best cell (row, column) for the board.
+        """
+        if state_key is None:
+            state_key = encode_board(board)
+        item_x, item_y, _ = self.table[state_key]
+        return item_x, item_y
@@ -0,0 +1,209 @@
+import numpy as np
+from bitboard import line_masks
+from encoding import cell_weights
+from qtable import attach_shared_memory, create_shared_memory
+from symmetry import symmetry_for
+
+
+ONGOING, O_WINS, X_WINS, DRAW = 0, 1, 2, 3
+# The status of a position, a win has the value of the symbol that won.
+
+MAX_INDEX_CELLS = 9
+# A 3x3 board has 5478 reachable positions, a 4x4 board has millions, so boards larger
+# than 3x3 don't get an index and play through the board and agent methods as before.
+
+_INDEXES = {}
+# The index of each board size and length to win, built the first time it is needed.
+
+
+class StateIndex(object):
+    """
+    Every position reachable from the empty board ('X' first), numbered in the order
+    of their codes (see `encoding.encode_board`), with what a game needs to know about them:
+
+        - codes[p]: The code of position p.
+        - free[p]: The N*N mask of the vacant cells.
+        - successors[p, cell]: The position after the symbol to move plays the cell,
+                -1 if the cell is taken or the game is over.
+        - status[p]: ONGOING, O_WINS, X_WINS or DRAW.
+        - to_move[p]: The value of the symbol to move, 1 for 'O' and 2 for 'X'.
+        - canonical[p], transforms[p]: The output of `Symmetry.canonicalize` for the board.
+
+    So playing a move, checking for a win or a draw, and listing the moves of a board
+    and the states they lead to are all array lookups.
+
+    The arrays are read-only. `share` moves them to shared memory, after which the index
+    pickles as the name of the memory and every process attaches to the same arrays.
+    """
+    def __init__(self, n=3, k=None, name=None, positions=None):
+        """
+        params:
+
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        - k(default=None) int: The number of symbols in a row needed to win, defaults to n.
+        - name(default=None) str: The shared memory of an index to attach to, the index is built if None.
+        - positions(default=None) int: The number of positions of the index in shared memory.
+        """
+        self.n = n
+        self.k = k
+        self.cells = n * n
+        self.memory = None
+        if name is None:
+            self.set_arrays(self.build())
+        else:
+            self.memory = attach_shared_memory(name)
+            self.set_arrays(self.views(self.memory.buf, positions))
+
+    def layout(self, positions):
+        """
+        The name, dtype and shape of each array, in the order they are laid out in shared memory.
+        """
+        return [
+            ('codes', np.int64, (positions,)),
+            ('canonical', np.int64, (positions,)),
+            ('successors', np.int32, (positions, self.cells)),
+            ('ids', np.int32, (3 ** self.cells,)),
+            ('free', bool, (positions, self.cells)),
+            ('status', np.int8, (positions,)),
+            ('to_move', np.uint8, (positions,)),
+            ('transforms', np.uint8, (positions,)),
+        ]
+
+    def views(self, buffer, positions):
+        arrays, offset = {}, 0
+        for field, dtype, shape in self.layout(positions):
+            array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            arrays[field] = array
+            offset += array.nbytes
+        return arrays
+
+    def set_arrays(self, arrays):
+        for field, array in arrays.items():
+            array.flags.writeable = False
+            setattr(self, field, array)
+
+    def build(self):
+        """
+        Walk every game from the empty board, one move deeper at a time.
+
+        return: dict of the arrays.
+        """
+        _, lines_by_cell = line_masks(self.n, self.k)
+        weights = cell_weights(self.n)
+        full = (1 << self.cells) - 1
+
+        found = {0: (0, 0, ONGOING)}
+        # code -> (mask of 'X', mask of 'O', status)
+        moves = {}
+        # code -> list of (cell, code after the move)
+        level = [0]
+        for depth in range(self.cells):
+            item = 2 if depth % 2 == 0 else 1
+            next_level = []
+            for code in level:
+                x_mask, o_mask, _ = found[code]
+                occupied = x_mask | o_mask
+                mine = x_mask if item == 2 else o_mask
+                moves[code] = []
+                for cell in range(self.cells):
+                    bit = 1 << cell
+                    if occupied & bit:
+                        continue
+                    next_code = code + item * weights[cell]
+                    moves[code].append((cell, next_code))
+                    if next_code in found:
+                        continue
+                    mask = mine | bit
+                    if any(mask & line == line for line in lines_by_cell[cell]):
+                        status = item
+                    elif occupied | bit == full:
+                        status = DRAW
+                    else:
+                        status = ONGOING
+                        next_level.append(next_code)
+                    found[next_code] = (mask, o_mask, status) if item == 2 else (x_mask, mask, status)
+            level = next_level
+
+        codes = np.array(sorted(found), dtype=np.int64)
+        positions = len(codes)
+        ids = np.full(3 ** self.cells, -1, dtype=np.int32)
+        ids[codes] = np.arange(positions, dtype=np.int32)
+
+        boards = np.zeros((positions, self.cells), dtype=np.int64)
+        successors = np.full((positions, self.cells), -1, dtype=np.int32)
+        status = np.zeros(positions, dtype=np.int8)
+        for position, code in enumerate(codes.tolist()):
+            x_mask, o_mask, status[position] = found[code]
+            for cell in range(self.cells):
+                if x_mask >> cell & 1:
+                    boards[position, cell] = 2
+                elif o_mask >> cell & 1:
+                    boards[position, cell] = 1
+            for cell, next_code in moves.get(code, ()):
+                successors[position, cell] = ids[next_code]
+
+        marks = np.count_nonzero(boards, axis=1)
+        canonical, transforms = symmetry_for(self.n).canonicalize_boards(boards.reshape(positions, self.n, self.n))
+        return {
+            'codes': codes,
+            'canonical': canonical.astype(np.int64),
+            'successors': successors,
+            'ids': ids,
+            'free': boards == 0,
+            'status': status,
+            'to_move': np.where(marks % 2 == 0, 2, 1).astype(np.uint8),
+            'transforms': transforms.astype(np.uint8),
+        }
+
+    def position(self, code):
+        """
+        Returns the position of a board code, -1 if it can't be reached in a game.
+        """
+        return int(self.ids[code])
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, field).nbytes for field, _, _ in self.layout(len(self)))
+
+    def share(self):
+        """
+        Move the arrays to shared memory, from then on the index pickles as the name of the memory.
+        Call `unlink` once every process is done with it.
+        """
+        if self.memory is not None:
+            return self
+        positions = len(self)
+        arrays = {field: getattr(self, field) for field, _, _ in self.layout(positions)}
+        self.memory = create_shared_memory(self.nbytes)
+        views = self.views(self.memory.buf, positions)
+        for field, view in views.items():
+            view[...] = arrays[field]
+        self.set_arrays(views)
+        return self
+
+    @property
+    def name(self):
+        return None if self.memory is None else self.memory.name
+
+    def __reduce__(self):
+        if self.memory is None:
+            return state_index_for, (self.n, self.k)
+            # Cheaper to build again than to send the arrays, and only once per process.
+        return StateIndex, (self.n, self.k, self.name, len(self))
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+def state_index_for(n, k=None):
+    """
+    Returns the shared `StateIndex` of an NxN board, None for boards too large to index.
+    """
+    if n * n > MAX_INDEX_CELLS:
+        return None
+    if (n, k) not in _INDEXES:
+        _INDEXES[(n, k)] = StateIndex(n, k)
+    return _INDEXES[(n, k)]
@@ -0,0 +1,129 @@
+import numpy as np
+from encoding import cell_weights
+
+
+_SYMMETRIES = {}
+# Cache of the symmetry tables per board size.
+
+
+class Symmetry(object):
+    """
+    Maps the 8 rotations and reflections of an NxN board to one canonical board.
+
+    The k-th symmetry is a permutation of the cells, `permutations[k][i]` is the cell
+    of the original board that lands on cell i of the transformed board.
+    The canonical board is the transformed board with the smallest code (see `encoding.encode_board`),
+    and the index of that transformation is what's needed to move actions
+    and values between the original and the canonical orientation.
+    """
+    def __init__(self, n=3):
+        """
+        params:
+
+        - n(default=3) int: The number of rows and columns in the tic-tac-toe board.
+        """
+        self.n = n
+        cells = np.arange(n * n).reshape(n, n)
+        self.permutations = np.array([
+            np.rot90(grid, k).ravel()
+            for grid in (cells, np.fliplr(cells))
+            for k in range(4)
+        ])
+        # 4 rotations of the board and 4 rotations of its mirror image.
+
+        self.inverse = np.argsort(self.permutations, axis=1)
+        # `inverse[k][j]` is the cell of the transformed board where the original cell j lands.
+
+        self.weights = np.array(
+            cell_weights(n),
+            dtype=np.int64 if 3 ** (n * n) < 2 ** 63 else object
+        )
+        # Codes of boards larger than 6x6 don't fit in 64 bits, use python ints for those.
+
+    def variant_codes(self, board):
+        """
+        Returns the codes of the 8 transformations of the board.
+
+        params:
+
+        - board: An NxN matrix of 0, 1 and 2 values.
+        return: array of 8 codes.
+        """
+        cells = np.asarray(board).ravel()
+        return cells[self.permutations].astype(self.weights.dtype) @ self.weights
+
+    def canonicalize(self, board):
+        """
+        Returns the code of the canonical board and the index of the transformation
+        which turns the board into it.
+
+        params:
+
+        - board: An NxN matrix of 0, 1 and 2 values.
+        return: tuple(int, int)
+        """
+        codes = self.variant_codes(board)
+        transform = int(np.argmin(codes))
+        return int(codes[transform]), transform
+
+    def canonicalize_boards(self, boards):
+        """
+        `canonicalize` for many boards at once.
+
+        params:
+
+        - boards: An array of shape (boards, N, N).
+        return: tuple(array of codes, array of transformation indices)
+        """
+        cells = np.asarray(boards).reshape(len(boards), -1)
+        codes = cells[:, self.permutations].astype(self.weights.dtype) @ self.weights
+        # The codes of the 8 transformations of every board, shape (boards, 8).
+        transforms = np.argmin(codes, axis=1)
+        return codes[np.arange(len(codes)), transforms], transforms
+
+    def canonical_action(self, transform, action):
+        """
+        Map a cell of the original board to the same cell of the canonical board.
+
+        params:
+
+        - transform int: The index returned by `canonicalize`.
+        - action tuple(int, int): The row and column on the original board.
+        return: tuple(int, int)
+        """
+        cell = self.inverse[transform][action[0] * self.n + action[1]]
+        return divmod(int(cell), self.n)
+
+    def original_action(self, transform, action):
+        """
+        Map a cell of the canonical board back to the original board.
+
+        params:
+
+        - transform int: The index returned by `canonicalize`.
+        - action tuple(int, int): The row and column on the canonical board.
+        return: tuple(int, int)
+        """
+        cell = self.permutations[transform][action[0] * self.n + action[1]]
+        return divmod(int(cell), self.n)
+
+    def canonical_values(self, transform, values):
+        """
+        Rearrange an NxN matrix of action values of the original board to the canonical orientation.
+        """
+        return np.ravel(values)[self.permutations[transform]].reshape(self.n, self.n)
+
+    def original_values(self, transform, values):
+        """
+        Rearrange an NxN matrix of action values of the canonical board to the original orientation.
+        """
+        return np.ravel(values)[self.inverse[transform]].reshape(self.n, self.n)
+
+
+def symmetry_for(n):
+    """
+    Returns the shared `Symmetry` tables for an NxN board.
+    """
+    if n not in _SYMMETRIES:
+        _SYMMETRIES[n] = Symmetry(n)
+    return _SYMMETRIES[n]
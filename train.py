@@ -1,26 +1,56 @@
+import json
+import time
+from contextlib import nullcontext
 import numpy as np
 from board import Board
+from metrics import Profile, Timer, metrics
 from utils import log
 from agent import Agent
 
 
-def optimize_bot(game, bot1, bot2):
+def optimize_bot(game, bot1, bot2, experience=None):
     """
     Punish or Reward the bot with respect to the agent that wins the game
+
+    params:
+    - experience(default=None): An `experience.ExperienceLog` to record the moves of the game in.
     """
     if game.winner == bot1.sym:
-        bot1.on_reward(1)
-        # reward
-        bot2.on_reward(-1)
-        # punishment
+        rewards = [(bot1, 1), (bot2, -1)]
+        # reward bot1, punish bot2
     elif game.winner == bot2.sym:
-        bot1.on_reward(-1)
-        bot2.on_reward(1)
+        rewards = [(bot1, -1), (bot2, 1)]
     else:
-        bot2.on_reward(-1)
-        bot1.on_reward(-1)
+        rewards = [(bot2, -1), (bot1, -1)]
+
+    for bot, reward in rewards:
+        if experience is not None:
+            experience.record(bot, reward)
+            # Record the moves before `on_reward` consumes them.
+        bot.on_reward(reward)
+    if experience is not None:
+        experience.end_episode()
 
-def train(epochs, bot1, bot2):
+def report_metrics(epoch, bot1, bot2):
+    """
+    Print the training metrics collected so far, along with the size of the tables.
+    """
+    report = metrics.snapshot()
+    report['epoch'] = epoch
+    report['states'] = {bot1.sym: len(bot1.states), bot2.sym: len(bot2.states)}
+    print(json.dumps(report))
+
+
+def train(epochs, bot1, bot2, k=None, experience=None, report_every=None, profiler=None):
+    """
+    Let two agents learn by playing `epochs` games against each other.
+
+    params:
+    - k(default=None): The number of symbols in a row needed to win, defaults to the board size.
+    - experience(default=None): An `experience.ExperienceLog` to record the games in.
+    - report_every(default=None): With `metrics.metrics` enabled, print them every `report_every` games.
+    - profiler(default=None): A profiler to run during the games, e.g. a `cProfile.Profile()`.
+    """
     bots = [{
         'mdl': bot1,
         'name': 'bot1',
@@ -31,24 +61,117 @@ def train(epochs, bot1, bot2):
         'wins': 0
     }]
 
-    for i in range(epochs):
-        log('-' * 100)
-        log('epoch: {}'.format(i + 1))
-        game = Board()
-        while not game.stale and not game.winner:
-            # Exit if the board is full
-            for bot in bots:
-                winner = game.player_move(bot['mdl'].sym, *bot['mdl'].select_move(game.board))
-                log('winner found:', winner)
-                if winner:
-                    optimize_bot(game, bot1, bot2)
-                    break
-                elif winner == 'draw':
-                    optimize_bot(game, bot1, bot2)
-                    break
+    with Profile(profiler) if profiler is not None else nullcontext():
+        for i in range(epochs):
+            log('-' * 100)
+            log('epoch: {}'.format(i + 1))
+            with Timer('game'):
+                game = Board(n=bot1.n, k=k, headless=True)
+                while not game.stale and not game.winner:
+                    # Exit if the board is full
+                    for bot in bots:
+                        result = game.step(bot['mdl'].sym, *bot['mdl'].select_move(game.board, game.state_code))
+                        if result.winner or result.draw:
+                            log('winner found:', result.winner or 'draw')
+                            if result.winner:
+                                bot['wins'] += 1
+                                # The bot that just moved is the only one that can have won.
+                            optimize_bot(game, bot1, bot2, experience=experience)
+                            break
+            if metrics.enabled and report_every and (i + 1) % report_every == 0:
+                report_metrics(i + 1, bot1, bot2)
     return bots[0]['wins'], bots[1]['wins']
 
 
+def add_arguments(parser):
+    """
+    The options of `run`, shared with the `cli.py` entry point.
+    """
+    parser.add_argument('--epochs', type=int, default=10000, help='games of self-play')
+    parser.add_argument('--n', type=int, default=3, help='rows and columns of the board')
+    parser.add_argument('--k', type=int, default=None, help='symbols in a row needed to win, n by default')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes to play in (see parallel_train), 1 to play in this one')
+    parser.add_argument('--sync-interval', type=int, default=100, help='games per worker between merges')
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help='checkpoint the run here and resume from it (see checkpoint.TrainingRun)')
+    parser.add_argument('--checkpoint-every', type=int, default=10000)
+    parser.add_argument('--experience', default=None, help='a file to log the games in (see experience.ExperienceLog)')
+    parser.add_argument('--report-every', type=int, default=None, help='print the metrics every so many games')
+    parser.add_argument('--save-x', default=None, help='a file to save the X agent in (see persistence.save_agent)')
+    parser.add_argument('--save-o', default=None, help='a file to save the O agent in')
+
+
+def check_arguments(parser, args):
+    """
+    Reject the combinations of options `run` can't honour, instead of quietly ignoring some of them.
+    """
+    if args.workers > 1:
+        if args.checkpoint_dir:
+            parser.error('--checkpoint-dir trains in one process, it can not be used with --workers')
+        if args.experience:
+            parser.error('--experience can not be used with --workers, the games are played in other processes')
+        if args.report_every:
+            parser.error('--report-every can not be used with --workers, the metrics are collected in other processes')
+    if args.checkpoint_dir and args.report_every:
+        parser.error('--report-every can not be used with --checkpoint-dir')
+
+
+def run(args):
+    """
+    Train two agents without any prompts, as configured by the options of `add_arguments`.
+    """
+    if args.seed is not None:
+        np.random.seed(args.seed)
+    bot1 = Agent(sym='X', n=args.n)
+    bot2 = Agent(sym='O', n=args.n)
+    if args.report_every:
+        metrics.enable()
+
+    experience = None
+    if args.experience:
+        from experience import ExperienceLog
+        experience = ExperienceLog(args.experience, n=args.n)
+
+    start = time.perf_counter()
+    try:
+        if args.checkpoint_dir:
+            from checkpoint import TrainingRun
+            training_run = TrainingRun(
+                args.checkpoint_dir, bot1, bot2,
+                checkpoint_every=args.checkpoint_every, k=args.k, experience=experience
+            )
+            wins = training_run.run(args.epochs)
+            bot1, bot2 = training_run.bot1, training_run.bot2
+        elif args.workers > 1:
+            from parallel_train import parallel_train
+            wins = parallel_train(
+                args.epochs, bot1, bot2, workers=args.workers,
+                sync_interval=args.sync_interval, seed=args.seed, k=args.k
+            )
+        else:
+            wins = train(args.epochs, bot1, bot2, k=args.k, experience=experience, report_every=args.report_every)
+    finally:
+        if experience is not None:
+            experience.close()
+
+    if args.save_x or args.save_o:
+        from persistence import save_agent
+        for bot, path in ((bot1, args.save_x), (bot2, args.save_o)):
+            if path:
+                save_agent(bot, path)
+
+    summary = {
+        'epochs': args.epochs,
+        'seconds': time.perf_counter() - start,
+        'wins': {bot1.sym: wins[0], bot2.sym: wins[1]},
+        'states': {bot1.sym: len(bot1.states), bot2.sym: len(bot2.states)},
+    }
+    print(json.dumps(summary))
+    return summary
+
+
 def main():
     bot1 = Agent(sym='X')
     bot2 = Agent(sym='O')
@@ -57,7 +180,7 @@ def main():
     game = Board(player_sym='O')
     bot1.get_serious()
     while not game.stale:
-        game.bot_play(*bot1.select_move(game.board))
+        game.bot_play(*bot1.select_move(game.board, game.state_code))
         if game.winner:
             break
         raw_coords = input('Enter your coordinates (comma-separated):')
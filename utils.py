@@ -1,6 +1,10 @@
 import os
 
 
+DEBUG = os.environ.get('ENVIRONMENT') == 'dev'
+# Read once, `log` is called on every move.
+
+
 def log(*args):
-    if os.environ.get('ENVIRONMENT') == 'dev':
+    if DEBUG:
         print(*args)